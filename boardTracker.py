@@ -0,0 +1,105 @@
+# This .py file follows the Sudoku board from frame to frame with optical flow
+#
+# Finding the board (contours, quadrilateral fit, corner refinement) is done on every frame when
+# nothing is known about the previous one. Once the board has been found, its 4 corners and the
+# 4 crossings of the thick lines inside it are followed with pyramidal Lucas-Kanade optical flow
+# instead. The board counts as lost when a point can't be followed, when following a point back
+# to the previous frame doesn't land where it started, or when the crossings are no longer where
+# the 4 corners put them (the board is flat). The board is also found again every REDETECT_FRAMES
+# frames, so the tracked corners can't slowly drift away from the real ones.
+
+import cv2
+import numpy as np
+
+# Frames tracked before the board is found by a full detection again
+REDETECT_FRAMES = 15
+
+# Most pixels a point may land away from where it started when followed back to the previous frame
+MAX_BACKTRACK_ERROR = 1.0
+
+# Most pixels a crossing may be away from where the tracked corners put it
+MAX_GRID_ERROR = 3.0
+
+# Pixels around the board that are tracked too, the board can't move further than this between frames
+TRACK_MARGIN = 64
+
+# Parameters of cv2.calcOpticalFlowPyrLK
+LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+# Corners of the board and crossings of the lines between its 3x3 boxes, in cells
+BOARD_CORNERS = np.float32([[0, 0], [9, 0], [9, 9], [0, 9]])
+BOX_CROSSINGS = np.float32([[3, 3], [6, 3], [6, 6], [3, 6]])
+
+# Position of the box crossings in the frame, for a board with corners rect
+# (top left, top right, bottom right, bottom left)
+def box_crossings(rect):
+    matrix = cv2.getPerspectiveTransform(BOARD_CORNERS, np.float32(rect))
+    return cv2.perspectiveTransform(BOX_CROSSINGS[np.newaxis], matrix)[0]
+
+# Region of the frame (left, top, right, bottom) holding the points and TRACK_MARGIN pixels around them
+def board_region(points, frame_shape):
+    left, top = np.maximum(np.floor(points.min(axis=0)).astype(int) - TRACK_MARGIN, 0)
+    right, bottom = np.ceil(points.max(axis=0)).astype(int) + TRACK_MARGIN + 1
+    return left, top, min(right, frame_shape[1]), min(bottom, frame_shape[0])
+
+# Gray image of a region of the frame, only that region is converted
+def gray_region(image, region):
+    left, top, right, bottom = region
+    return cv2.cvtColor(image[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+
+class BoardTracker:
+    def __init__(self, redetect_frames=REDETECT_FRAMES):
+        self.redetect_frames = redetect_frames
+        self.gray = None            # Gray board_region of the points in the previous frame
+        self.region = None
+        self.points = None          # Corners and box crossings of the board in that frame, (8, 2)
+        self.frames_since_detection = 0
+        self.tracked = 0            # Number of frames where the board was tracked
+        self.detected = 0           # Number of full detections the tracking started from
+        self.lost = 0               # Number of times the tracking lost the board
+
+    # Forget the board, e.g. when it is gone or its shape isn't valid
+    def reset(self):
+        self.gray = None
+        self.region = None
+        self.points = None
+
+    # Start following the board with corners rect (top left, top right, bottom right, bottom left)
+    # found in image by a full detection. image must not have anything drawn on it
+    def start(self, image, rect):
+        self.points = np.vstack([rect, box_crossings(rect)]).astype(np.float32)
+        self.region = board_region(self.points, image.shape)
+        self.gray = gray_region(image, self.region)
+        self.frames_since_detection = 0
+        self.detected += 1
+
+    # Follow the board into the next frame
+    # Return its corners as a float32 (4, 2) array, or None when the board has to be found by a
+    # full detection (no board yet, board lost or time for a new detection)
+    def track(self, image):
+        if self.points is None or self.frames_since_detection >= self.redetect_frames:
+            return None
+
+        # Only the region around the board of the previous frame is followed into this frame
+        gray = gray_region(image, self.region)
+        offset = np.float32(self.region[:2])
+        previous = (self.points - offset).reshape(-1, 1, 2)
+        points, status, _ = cv2.calcOpticalFlowPyrLK(self.gray, gray, previous, None, **LK_PARAMS)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.gray, points, None, **LK_PARAMS)
+        backtrack_error = np.linalg.norm(back - previous, axis=2)
+        points = points.reshape(-1, 2) + offset
+
+        rect = points[:4]
+        if (not status.all() or not back_status.all() or backtrack_error.max() > MAX_BACKTRACK_ERROR
+                or np.linalg.norm(points[4:] - box_crossings(rect), axis=1).max() > MAX_GRID_ERROR):
+            self.lost += 1
+            self.reset()
+            return None
+
+        self.points = points
+        self.region = board_region(points, image.shape)
+        self.gray = gray_region(image, self.region)
+        self.frames_since_detection += 1
+        self.tracked += 1
+        return rect.copy()
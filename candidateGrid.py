@@ -0,0 +1,60 @@
+# This .py file computes the candidates of every cell of a board once, to be shared by
+# validation (sudokuDifficulty.is_valid_sudoku), grading (sudokuDifficulty.calculate_difficulty)
+# and solving (sudokuSolver.solve_sudoku / count_solutions / solve_grid)
+#
+# Digit d is bit d-1 of a 9-bit mask. Cells are indexed row * 9 + col.
+# A CandidateGrid is never changed after it is built, the solvers copy what they need.
+
+ALL_DIGITS = 0x1FF
+BIT_COUNT = [bin(mask).count("1") for mask in range(ALL_DIGITS + 1)]
+
+# 3x3 box of every cell
+BOX_OF = [(cell // 27) * 3 + (cell % 9) // 3 for cell in range(81)]
+
+class CandidateGrid:
+    def __init__(self, grid):
+        self.values = [0] * 81          # Given digits, 0 for empty cells
+        self.rows = [0] * 9             # Digits used by every row, column and box
+        self.cols = [0] * 9
+        self.boxes = [0] * 9
+        self.candidates = [0] * 81      # Digits that fit in every empty cell, 0 for filled cells
+
+        for i in range(9):
+            for j in range(9):
+                digit = grid[i][j]
+                if digit == 0:
+                    continue
+                cell = i * 9 + j
+                b = BOX_OF[cell]
+                bit = 1 << (digit - 1)
+                self.values[cell] = digit
+                self.rows[i] |= bit
+                self.cols[j] |= bit
+                self.boxes[b] |= bit
+
+        for cell in range(81):
+            if self.values[cell] == 0:
+                self.candidates[cell] = ALL_DIGITS & ~(self.rows[cell // 9] | self.cols[cell % 9] | self.boxes[BOX_OF[cell]])
+
+        # False if the given digits conflict: a repeated digit sets the same bit twice, so some unit
+        # has fewer digits in its mask than given digits (sudokuDifficulty.find_conflicts tells which)
+        given = sum(1 for value in self.values if value)
+        self.valid = all(sum(BIT_COUNT[mask] for mask in masks) == given
+                         for masks in (self.rows, self.cols, self.boxes))
+
+    # Candidates of a cell, as a 9-bit mask
+    def mask(self, row, col):
+        return self.candidates[row * 9 + col]
+
+    # Candidates of a cell, as a set of digits (empty for filled cells)
+    def possibilities(self, row, col):
+        mask = self.candidates[row * 9 + col]
+        return {d + 1 for d in range(9) if mask >> d & 1}
+
+    # Number of empty cells with only one candidate
+    def count_naked_singles(self):
+        return sum(1 for mask in self.candidates if BIT_COUNT[mask] == 1)
+
+    # True if an empty cell has no candidate left
+    def has_dead_cell(self):
+        return any(value == 0 and mask == 0 for value, mask in zip(self.values, self.candidates))
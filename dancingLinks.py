@@ -0,0 +1,209 @@
+# This .py file contains an exact cover Sudoku solver using Knuth's Algorithm X with Dancing Links
+#
+# Sudoku as an exact cover problem:
+# - 729 rows, one for every (cell, digit) choice
+# - 324 columns, one for every constraint that has to be satisfied exactly once:
+#   every cell has a digit, every row / column / 3x3 block has every digit
+# Each row covers exactly 4 columns, so the matrix has 729 * 4 = 2916 nodes.
+#
+# Instead of one Python object per node, the links are stored in flat integer lists
+# (left, right, up, down, column, row) indexed by node number. Node 0 is the root,
+# nodes 1-324 are the column headers and the rest are the matrix nodes.
+# The lists for an empty board are built once and copied for every puzzle.
+
+ROOT = 0
+NUM_COLUMNS = 324
+
+# Row id of placing digit (1-9) in cell (i, j)
+def row_id(i, j, digit):
+    return (i * 9 + j) * 9 + digit - 1
+
+# The 4 constraint columns (1-324) covered by placing digit in cell (i, j)
+def row_columns(i, j, digit):
+    d = digit - 1
+    b = (i // 3) * 3 + j // 3
+    return (1 + i * 9 + j,          # Cell (i, j) is filled
+            82 + i * 9 + d,         # Row i has the digit
+            163 + j * 9 + d,        # Column j has the digit
+            244 + b * 9 + d)        # Block b has the digit
+
+# Build the linked lists of the full exact cover matrix of an empty board
+def build_template():
+    num_nodes = 1 + NUM_COLUMNS + 729 * 4
+    left = [0] * num_nodes
+    right = [0] * num_nodes
+    up = list(range(num_nodes))
+    down = list(range(num_nodes))
+    column = list(range(num_nodes))
+    row = [-1] * num_nodes
+    size = [0] * (NUM_COLUMNS + 1)
+    first_node = [0] * 729     # One node of every row, to find the row again from its id
+
+    # Header list: root <-> 1 <-> 2 ... <-> 324 <-> root
+    for c in range(NUM_COLUMNS + 1):
+        left[c] = c - 1 if c > 0 else NUM_COLUMNS
+        right[c] = c + 1 if c < NUM_COLUMNS else ROOT
+
+    node = NUM_COLUMNS + 1
+    for i in range(9):
+        for j in range(9):
+            for digit in range(1, 10):
+                r = row_id(i, j, digit)
+                first = node
+                first_node[r] = first
+                for c in row_columns(i, j, digit):
+                    # Append the node at the bottom of column c
+                    column[node] = c
+                    row[node] = r
+                    up[node] = up[c]
+                    down[node] = c
+                    down[up[c]] = node
+                    up[c] = node
+                    size[c] += 1
+                    # Link it into its row (circular)
+                    left[node] = node - 1 if node > first else first + 3
+                    right[node] = node + 1 if node < first + 3 else first
+                    node += 1
+    return left, right, up, down, column, row, size, first_node
+
+TEMPLATE = build_template()
+
+class DancingLinks:
+    def __init__(self, budget=None):
+        self.budget = budget    # SolveBudget ticked on every search node, None for no limit
+        left, right, up, down, column, row, size, first_node = TEMPLATE
+        self.left = left[:]
+        self.right = right[:]
+        self.up = up[:]
+        self.down = down[:]
+        self.column = column   # Never modified, safe to share
+        self.row = row
+        self.size = size[:]
+        self.first_node = first_node
+        self.covered = bytearray(NUM_COLUMNS + 1)
+
+    # Remove column c from the header list and all rows that intersect it from the other columns
+    def cover(self, c):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        self.covered[c] = 1
+        left[right[c]] = left[c]
+        right[left[c]] = right[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                up[down[j]] = up[j]
+                down[up[j]] = down[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    # Exact reverse of cover(c)
+    def uncover(self, c):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                up[down[j]] = j
+                down[up[j]] = j
+                j = left[j]
+            i = up[i]
+        left[right[c]] = c
+        right[left[c]] = c
+        self.covered[c] = 0
+
+    # Select a row up front (a given digit), return False if it clashes with an earlier one
+    def select_row(self, r):
+        node = self.first_node[r]
+        columns = [self.column[node + k] for k in range(4)]
+        if any(self.covered[c] for c in columns):
+            return False
+        for c in columns:
+            self.cover(c)
+        return True
+
+    # Generate every exact cover of the remaining columns as a list of row ids
+    # The same list is reused between solutions, copy it if you keep it
+    def search(self, solution):
+        left, right, down, column, size = self.left, self.right, self.down, self.column, self.size
+        if self.budget is not None:
+            self.budget.tick()
+
+        # Choose the column with the fewest rows left (S heuristic)
+        c = right[ROOT]
+        if c == ROOT:
+            yield solution
+            return
+        best = c
+        best_size = size[c]
+        while c != ROOT and best_size > 1:
+            if size[c] < best_size:
+                best, best_size = c, size[c]
+            c = right[c]
+        if best_size == 0:
+            return
+
+        self.cover(best)
+        r = down[best]
+        while r != best:
+            solution.append(self.row[r])
+            j = right[r]
+            while j != r:
+                self.cover(column[j])
+                j = right[j]
+
+            yield from self.search(solution)
+
+            j = left[r]
+            while j != r:
+                self.uncover(column[j])
+                j = left[j]
+            solution.pop()
+            r = down[r]
+        self.uncover(best)
+
+# Set up the exact cover matrix for a puzzle, return None if the given digits clash
+def links_for(matrix, budget=None):
+    links = DancingLinks(budget)
+    for i in range(9):
+        for j in range(9):
+            if matrix[i][j] != 0 and not links.select_row(row_id(i, j, matrix[i][j])):
+                return None
+    return links
+
+# Generate every solution of the puzzle as a new 9x9 list of lists
+def iter_solutions(matrix, budget=None):
+    links = links_for(matrix, budget)
+    if links is None:
+        return
+    for solution in links.search([]):
+        solved = [row[:] for row in matrix]
+        for r in solution:
+            cell, d = divmod(r, 9)
+            solved[cell // 9][cell % 9] = d + 1
+        yield solved
+
+# Count the solutions of the puzzle, stopping early once "limit" solutions are found
+def count_solutions(matrix, limit=None, budget=None):
+    links = links_for(matrix, budget)
+    if links is None:
+        return 0
+    count = 0
+    for _ in links.search([]):
+        count += 1
+        if limit is not None and count >= limit:
+            break
+    return count
+
+# Solve Sudoku in place, return True if a solution was found
+# candidates (a candidateGrid.CandidateGrid) only lets conflicting grids be rejected before building the links
+def solve_sudoku_dlx(matrix, budget=None, candidates=None):
+    if candidates is not None and not candidates.valid:
+        return False
+    for solved in iter_solutions(matrix, budget):
+        for i in range(9):
+            matrix[i][:] = solved[i]
+        return True
+    return False
@@ -0,0 +1,56 @@
+# This .py file stabilizes the recognized digits of a board over several frames
+#
+# Every frame recognizes the 81 cells on its own, so a digit that is hard to read can flip from
+# frame to frame. The DigitVoter adds up the class probabilities of every cell over the frames,
+# multiplying the older votes by DECAY every frame (a sliding window with exponential decay,
+# a frame older than ~10 frames hardly counts anymore). The stabilized grid holds the class with
+# the most votes in every cell, and the pipeline only has to solve again when that grid changes.
+
+import numpy as np
+
+# Weight of the votes of the previous frame, the newest frame always has weight 1
+DECAY = 0.7
+
+# More cells than this differing from the stabilized grid means another board: start over
+RESET_CELLS = 20
+
+class DigitVoter:
+    def __init__(self, decay=DECAY, reset_cells=RESET_CELLS):
+        self.decay = decay
+        self.reset_cells = reset_cells
+        self.votes = None           # (9, 9, 10) decayed class probabilities, class 0 = empty cell
+        self.stable_grid = None     # 9x9 array of the classes with the most votes
+        self.frames = 0             # Number of updates
+        self.changes = 0            # Number of updates that changed the stabilized grid
+
+    # Forget the votes, e.g. when the board is gone
+    def reset(self):
+        self.votes = None
+        self.stable_grid = None
+
+    # Add the digits recognized in one frame: the 9x9 grid (0 = empty) and the 9x9x9 class
+    # probabilities of every cell (all zeros for empty cells)
+    # Return (stabilized grid, its 9x9x9 class probabilities, True if the stabilized grid changed)
+    def update(self, grid, cell_probabilities):
+        grid_array = np.asarray(grid)
+        observation = np.zeros((9, 9, 10), dtype=np.float32)
+        observation[:, :, 0] = grid_array == 0
+        observation[:, :, 1:] = cell_probabilities
+
+        if self.stable_grid is not None and np.count_nonzero(grid_array != self.stable_grid) > self.reset_cells:
+            self.reset()    # Another board came into view
+        if self.votes is None:
+            self.votes = observation
+        else:
+            self.votes = self.votes * self.decay + observation
+
+        stable_grid = np.argmax(self.votes, axis=2)
+        changed = self.stable_grid is None or not np.array_equal(stable_grid, self.stable_grid)
+        self.stable_grid = stable_grid
+        self.frames += 1
+        self.changes += changed
+
+        # Share of the votes of every digit, the same scale as the probabilities of a single frame
+        probabilities = self.votes[:, :, 1:] / np.maximum(self.votes.sum(axis=2, keepdims=True), 1e-9)
+        probabilities[stable_grid == 0] = 0
+        return stable_grid.tolist(), probabilities, changed
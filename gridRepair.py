@@ -0,0 +1,154 @@
+# This .py file repairs recognized grids that have a misread digit
+#
+# When the recognized digits conflict, the conflicting digit the classifier was least sure about
+# is most likely the misread one. It is replaced by its second most likely class, or removed,
+# and the resulting grid is solved right away, so a good frame isn't thrown away.
+#
+# When that isn't enough (or the grid has no or several solutions), repair_search looks at the
+# top-k classes of every recognized cell and tries alternative grids in order of joint likelihood:
+# the cost of a change is log(p(read digit)) - log(p(new digit)), the cost of a grid is the sum of
+# the costs of its changes. The most likely grid without conflicts that has exactly one solution
+# wins. The search is bounded by a number of grids and a time limit.
+# Running out of time raises solveBudget.SolveBudgetExceeded instead of returning no repair, so the
+# caller can tell a grid that can't be repaired from a search that didn't finish.
+
+import heapq
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import sudokuDifficulty
+from solveBudget import SolveBudgetExceeded
+
+# Number of conflicting cells to try, least confident first
+MAX_REPAIR_CELLS = 4
+
+# Number of classes kept per cell
+TOP_K = 3
+
+# Probability given to "this digit is not there at all" (a smudge or grid line read as a digit)
+EMPTY_PROBABILITY = 0.02
+
+# Bounds of repair_search: least confident cells considered, grids tried and seconds spent
+MAX_SEARCH_CELLS = 20
+MAX_SEARCH_GRIDS = 200
+SEARCH_TIME_LIMIT = 0.1
+
+# A repaired grid
+# changes: list of ((row, col), new digit), new digit 0 for a removed digit
+# likelihood: probability of the repaired grid relative to the grid as it was read (1 = as likely)
+Repair = namedtuple("Repair", ["grid", "result", "changes", "likelihood"])
+
+# Confidence of the classifier in the digit of every cell, a 9x9 array (1 for empty cells)
+# cell_probabilities is the 9x9x9 array of class probabilities given by the recognizer
+def cell_confidence(grid, cell_probabilities):
+    grid_array = np.asarray(grid)
+    digits = np.maximum(grid_array - 1, 0)
+    confidence = np.take_along_axis(cell_probabilities, digits[:, :, np.newaxis], axis=2)[:, :, 0]
+    return np.where(grid_array == 0, 1.0, confidence)
+
+# The k most likely digits of every cell and their probabilities, most likely first
+# Return two 9x9xk arrays (digits 1-9 and probabilities, all 0 for empty cells)
+def top_k_digits(cell_probabilities, k=TOP_K):
+    order = np.argsort(-cell_probabilities, axis=2, kind="stable")[:, :, :k]
+    probabilities = np.take_along_axis(cell_probabilities, order, axis=2)
+    digits = np.where(probabilities > 0, order + 1, 0)
+    return digits, probabilities
+
+# Second most likely digit (1-9) of a cell that has been read as "digit"
+def second_best_digit(probabilities, digit):
+    order = np.argsort(probabilities)[::-1] + 1
+    return int(order[1] if order[0] == digit else order[0])
+
+# Generate the single-cell repairs of a grid with conflicts, most promising first:
+# for the conflicting cells from least to most confident, the grid with the digit of that cell
+# replaced by its second best class and then with the digit removed.
+# Generate (grid, (row, col), new digit) tuples, new digit 0 for a removed digit
+def conflict_repairs(grid, cell_probabilities, conflicts):
+    confidence = cell_confidence(grid, cell_probabilities)
+    cells = sorted(sudokuDifficulty.conflict_cells(conflicts), key=lambda cell: confidence[cell])
+    for i, j in cells[:MAX_REPAIR_CELLS]:
+        for digit in (second_best_digit(cell_probabilities[i, j], grid[i][j]), 0):
+            repaired = [row[:] for row in grid]
+            repaired[i][j] = digit
+            yield repaired, (i, j), digit
+
+# Try to repair a grid with conflicts by changing one digit
+# solve(grid, time_limit) returns the sudokuSolver.SolveResult of a grid (time_limit None for the default),
+# it may raise SolveBudgetExceeded when the grid can't be answered yet, which stops the repair
+# With a time_limit, all the solves together get at most that many seconds
+# Return the Repair of the first change without conflicts that has exactly one solution,
+# or None if no single change fixes the grid. Raise SolveBudgetExceeded if the time runs out first
+def repair_conflicts(grid, cell_probabilities, conflicts, solve, time_limit=None):
+    confidence = cell_confidence(grid, cell_probabilities)
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    for repaired, (i, j), digit in conflict_repairs(grid, cell_probabilities, conflicts):
+        remaining = deadline - time.perf_counter() if deadline is not None else None
+        if remaining is not None and remaining <= 0:
+            raise SolveBudgetExceeded("time", f"Conflict repair ran out of its {time_limit} s")
+        if sudokuDifficulty.find_conflicts(repaired):
+            continue    # This change doesn't fix every conflict
+        result = solve(repaired, remaining)
+        if result.status == "solved":
+            new_probability = cell_probabilities[i, j, digit - 1] if digit else EMPTY_PROBABILITY
+            return Repair(repaired, result, [((i, j), digit)], float(new_probability / confidence[i, j]))
+    return None
+
+# The possible changes of a grid as (cost, (row, col), new digit), cheapest first
+# The other top-k classes of the least confident recognized cells are considered. With allow_removal,
+# removing a digit is one of the changes (this can't help grids with several solutions)
+def candidate_changes(grid, cell_probabilities, k=TOP_K, allow_removal=True):
+    confidence = cell_confidence(grid, cell_probabilities)
+    top_digits, top_probabilities = top_k_digits(cell_probabilities, k)
+    cells = sorted(((i, j) for i in range(9) for j in range(9) if grid[i][j] != 0), key=lambda cell: confidence[cell])
+    changes = []
+    for i, j in cells[:MAX_SEARCH_CELLS]:
+        read_probability = max(float(confidence[i, j]), 1e-6)
+        for digit, probability in zip(top_digits[i, j], top_probabilities[i, j]):
+            if digit != 0 and digit != grid[i][j] and probability > 0:
+                changes.append((max(0.0, math.log(read_probability / probability)), (i, j), int(digit)))
+        if allow_removal:
+            changes.append((max(0.0, math.log(read_probability / EMPTY_PROBABILITY)), (i, j), 0))
+    changes.sort()
+    return changes
+
+# Look for the most likely repaired grid with exactly one solution
+# cell_probabilities and solve work like in repair_conflicts, k classes are kept per cell
+# Sets of changes are tried in order of increasing total cost (decreasing joint likelihood), with
+# the usual best-first enumeration of subsets of sorted items: a set (..., a) is followed by
+# (..., a, a+1) and (..., a+1). Return the Repair or None if none was found within max_grids grids,
+# raise SolveBudgetExceeded if time_limit runs out first
+def repair_search(grid, cell_probabilities, solve, k=TOP_K, allow_removal=True,
+                  max_grids=MAX_SEARCH_GRIDS, time_limit=SEARCH_TIME_LIMIT):
+    changes = candidate_changes(grid, cell_probabilities, k, allow_removal)
+    if not changes:
+        return None
+    deadline = time.perf_counter() + time_limit
+    heap = [(changes[0][0], (0,))]
+    tried = 0
+    while heap and tried < max_grids:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise SolveBudgetExceeded("time", f"Repair search ran out of its {time_limit} s")
+        cost, chosen = heapq.heappop(heap)
+        last = chosen[-1]
+        if last + 1 < len(changes):
+            heapq.heappush(heap, (cost + changes[last + 1][0], chosen + (last + 1,)))
+            heapq.heappush(heap, (cost - changes[last][0] + changes[last + 1][0], chosen[:-1] + (last + 1,)))
+
+        cells = [changes[n][1] for n in chosen]
+        if len(set(cells)) != len(cells):
+            continue    # Two changes of the same cell
+        repaired = [row[:] for row in grid]
+        for n in chosen:
+            _, (i, j), digit = changes[n]
+            repaired[i][j] = digit
+        if sudokuDifficulty.find_conflicts(repaired):
+            continue
+        tried += 1
+        result = solve(repaired, remaining)
+        if result.status == "solved":
+            return Repair(repaired, result, [changes[n][1:] for n in chosen], math.exp(-cost))
+    return None
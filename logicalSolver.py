@@ -0,0 +1,298 @@
+# This .py file solves Sudoku step by step the way a person would, without guessing
+#
+# The candidates of every cell are kept as 9-bit masks (digit d is bit d-1). Placing a digit
+# removes it from the candidates of the 20 peers of the cell, so the masks are always up to date.
+# Every step uses the easiest technique that makes progress, and the solver records which
+# techniques were needed and how often. The hardest technique needed says how difficult the
+# puzzle is for a human; puzzles these techniques can't finish need trial and error.
+
+from itertools import combinations
+
+from candidateGrid import ALL_DIGITS, BIT_COUNT, BOX_OF, CandidateGrid
+
+# Cell indices (row * 9 + col) of the 27 units: 9 rows, 9 columns, 9 boxes
+ROWS = [[i * 9 + j for j in range(9)] for i in range(9)]
+COLS = [[i * 9 + j for i in range(9)] for j in range(9)]
+BOXES = [[(b // 3 * 3 + k // 3) * 9 + b % 3 * 3 + k % 3 for k in range(9)] for b in range(9)]
+UNITS = ROWS + COLS + BOXES
+
+ROW_OF = [cell // 9 for cell in range(81)]
+COL_OF = [cell % 9 for cell in range(81)]
+
+# The 20 other cells sharing a row, column or box with each cell
+PEERS = [sorted(set(ROWS[ROW_OF[cell]] + COLS[COL_OF[cell]] + BOXES[BOX_OF[cell]]) - {cell}) for cell in range(81)]
+PEER_SETS = [set(peers) for peers in PEERS]
+
+class LogicalSolver:
+    # candidates is the CandidateGrid of the grid, computed here if not given
+    def __init__(self, grid, candidates=None):
+        if candidates is None:
+            candidates = CandidateGrid(grid)
+        self.values = candidates.values[:]
+        self.candidates = candidates.candidates[:]  # 0 for filled cells
+        self.valid = candidates.valid               # False once a contradiction shows up
+        self.technique_counts = {}                  # Technique name -> number of times it was used
+        if self.valid and candidates.has_dead_cell():
+            self.valid = False
+
+    def solved(self):
+        return self.valid and all(self.values)
+
+    def place(self, cell, digit):
+        bit = 1 << (digit - 1)
+        self.values[cell] = digit
+        self.candidates[cell] = 0
+        for peer in PEERS[cell]:
+            if self.candidates[peer] & bit:
+                self.remove(peer, bit)
+
+    # Remove candidates from a cell, return True if anything was removed
+    def remove(self, cell, mask):
+        if not self.candidates[cell] & mask:
+            return False
+        self.candidates[cell] &= ~mask
+        if self.candidates[cell] == 0 and self.values[cell] == 0:
+            self.valid = False      # No digit left for this cell
+        return True
+
+    def record(self, technique):
+        self.technique_counts[technique] = self.technique_counts.get(technique, 0) + 1
+
+    # Apply techniques until the puzzle is solved or none of them helps anymore
+    # Return True if the puzzle got solved
+    def solve(self):
+        while self.valid and not all(self.values):
+            for name, technique in TECHNIQUES:
+                if technique(self):
+                    self.record(name)
+                    break
+            else:
+                return False    # Stuck, the puzzle needs trial and error
+        return self.solved()
+
+    # Hardest technique used so far, None if none was needed
+    def hardest_technique(self):
+        used = [name for name, _ in TECHNIQUES if name in self.technique_counts]
+        return used[-1] if used else None
+
+# A cell with only one candidate left
+def naked_single(solver):
+    for cell in range(81):
+        mask = solver.candidates[cell]
+        if mask and BIT_COUNT[mask] == 1:
+            solver.place(cell, mask.bit_length())
+            return True
+    return False
+
+# A digit that fits in only one cell of a unit
+def hidden_single(solver):
+    candidates = solver.candidates
+    for unit in UNITS:
+        seen_once = 0
+        seen_more = 0
+        for cell in unit:
+            seen_more |= seen_once & candidates[cell]
+            seen_once |= candidates[cell]
+        single = seen_once & ~seen_more
+        if single:
+            bit = single & -single
+            for cell in unit:
+                if candidates[cell] & bit:
+                    solver.place(cell, bit.bit_length())
+                    return True
+    return False
+
+# n cells of a unit that together have only n candidates: those digits can go nowhere else in the unit
+def naked_subset(solver, size):
+    candidates = solver.candidates
+    for unit in UNITS:
+        cells = [cell for cell in unit if 2 <= BIT_COUNT[candidates[cell]] <= size]
+        for subset in combinations(cells, size):
+            mask = 0
+            for cell in subset:
+                mask |= candidates[cell]
+            if BIT_COUNT[mask] != size:
+                continue
+            changed = False
+            for cell in unit:
+                if cell not in subset and candidates[cell]:
+                    changed |= solver.remove(cell, mask)
+            if changed:
+                return True
+    return False
+
+# n digits of a unit that only fit in the same n cells: those cells can't hold other digits
+def hidden_subset(solver, size):
+    candidates = solver.candidates
+    for unit in UNITS:
+        places = {}     # Digit bit -> cells of the unit where it fits
+        for cell in unit:
+            mask = candidates[cell]
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                places.setdefault(bit, []).append(cell)
+        digits = [bit for bit, cells in places.items() if 2 <= len(cells) <= size]
+        for subset in combinations(digits, size):
+            cells = set()
+            mask = 0
+            for bit in subset:
+                cells.update(places[bit])
+                mask |= bit
+            if len(cells) != size:
+                continue
+            changed = False
+            for cell in cells:
+                changed |= solver.remove(cell, ~mask & ALL_DIGITS)
+            if changed:
+                return True
+    return False
+
+def naked_pair(solver):
+    return naked_subset(solver, 2)
+
+def naked_triple(solver):
+    return naked_subset(solver, 3)
+
+def hidden_pair(solver):
+    return hidden_subset(solver, 2)
+
+def hidden_triple(solver):
+    return hidden_subset(solver, 3)
+
+# All places of a digit in a unit are in one line, or all places in a line are in one box:
+# remove the digit from the rest of that line or box
+def intersection_removal(solver, bases, line_of, lines):
+    candidates = solver.candidates
+    for base in bases:
+        for d in range(9):
+            bit = 1 << d
+            cells = [cell for cell in base if candidates[cell] & bit]
+            if len(cells) < 2:
+                continue
+            target = line_of[cells[0]]
+            if any(line_of[cell] != target for cell in cells):
+                continue
+            changed = False
+            for cell in lines[target]:
+                if cell not in base:
+                    changed |= solver.remove(cell, bit)
+            if changed:
+                return True
+    return False
+
+# Pointing pairs/triples: the places of a digit in a box are all in one row or column
+def pointing(solver):
+    return (intersection_removal(solver, BOXES, ROW_OF, ROWS) or
+            intersection_removal(solver, BOXES, COL_OF, COLS))
+
+# Box/line reduction: the places of a digit in a row or column are all in one box
+def box_line_reduction(solver):
+    return (intersection_removal(solver, ROWS, BOX_OF, BOXES) or
+            intersection_removal(solver, COLS, BOX_OF, BOXES))
+
+# n rows where a digit only fits in the same n columns (or the other way around):
+# remove the digit from those columns in all other rows
+def fish(solver, size):
+    candidates = solver.candidates
+    for d in range(9):
+        bit = 1 << d
+        for base_lines, cover_lines, cover_of in ((ROWS, COLS, COL_OF), (COLS, ROWS, ROW_OF)):
+            positions = []      # (base line index, set of cover line indices)
+            for index, line in enumerate(base_lines):
+                covers = {cover_of[cell] for cell in line if candidates[cell] & bit}
+                if 2 <= len(covers) <= size:
+                    positions.append((index, covers))
+            for subset in combinations(positions, size):
+                covers = set().union(*(c for _, c in subset))
+                if len(covers) != size:
+                    continue
+                bases = {index for index, _ in subset}
+                changed = False
+                for cover in covers:
+                    for cell in cover_lines[cover]:
+                        base = ROW_OF[cell] if base_lines is ROWS else COL_OF[cell]
+                        if base not in bases:
+                            changed |= solver.remove(cell, bit)
+                if changed:
+                    return True
+    return False
+
+def x_wing(solver):
+    return fish(solver, 2)
+
+def swordfish(solver):
+    return fish(solver, 3)
+
+# A cell with candidates {a, b} that sees a cell with {a, c} and one with {b, c}:
+# whichever digit the pivot gets, one of the pincers is c, so cells seeing both pincers can't be c
+def xy_wing(solver):
+    candidates = solver.candidates
+    for pivot in range(81):
+        mask = candidates[pivot]
+        if BIT_COUNT[mask] != 2:
+            continue
+        pincers = [cell for cell in PEERS[pivot]
+                   if BIT_COUNT[candidates[cell]] == 2 and BIT_COUNT[candidates[cell] & mask] == 1]
+        for first, second in combinations(pincers, 2):
+            if candidates[first] & mask == candidates[second] & mask:
+                continue    # Both pincers share the same pivot digit
+            c = candidates[first] & candidates[second] & ~mask
+            if not c:
+                continue
+            changed = False
+            for cell in PEER_SETS[first] & PEER_SETS[second]:
+                if cell != pivot:
+                    changed |= solver.remove(cell, c)
+            if changed:
+                return True
+    return False
+
+# Techniques from easiest to hardest
+TECHNIQUES = [
+    ("naked_single", naked_single),
+    ("hidden_single", hidden_single),
+    ("pointing", pointing),
+    ("box_line_reduction", box_line_reduction),
+    ("naked_pair", naked_pair),
+    ("hidden_pair", hidden_pair),
+    ("naked_triple", naked_triple),
+    ("hidden_triple", hidden_triple),
+    ("x_wing", x_wing),
+    ("xy_wing", xy_wing),
+    ("swordfish", swordfish),
+]
+
+# Difficulty (0-100) of the hardest technique needed, "trial_and_error" when the techniques aren't enough
+TECHNIQUE_SCORES = {
+    None: 0,
+    "naked_single": 10,
+    "hidden_single": 20,
+    "pointing": 40,
+    "box_line_reduction": 40,
+    "naked_pair": 50,
+    "hidden_pair": 55,
+    "naked_triple": 60,
+    "hidden_triple": 65,
+    "x_wing": 70,
+    "xy_wing": 75,
+    "swordfish": 80,
+    "trial_and_error": 100,
+}
+
+# Every step beyond singles adds a point, up to this many
+MAX_STEP_BONUS = 10
+
+# Solve a grid with human techniques
+# Return (score 0-100, technique counts, hardest technique). The hardest technique is
+# "trial_and_error" if the techniques couldn't finish the puzzle
+def grade_techniques(grid, candidates=None):
+    solver = LogicalSolver(grid, candidates)
+    if not solver.solve():
+        return TECHNIQUE_SCORES["trial_and_error"], solver.technique_counts, "trial_and_error"
+
+    hardest = solver.hardest_technique()
+    advanced_steps = sum(count for name, count in solver.technique_counts.items()
+                         if name not in ("naked_single", "hidden_single"))
+    score = TECHNIQUE_SCORES[hardest] + min(advanced_steps, MAX_STEP_BONUS)
+    return score, solver.technique_counts, hardest
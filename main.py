@@ -8,8 +8,17 @@ from keras.models import Sequential
 from keras.layers import Dense, Dropout, Flatten
 from keras.layers import Conv2D, MaxPooling2D
 import realTimeSudokuSolver
+import digitVoting
+import recognitionCache
+import boardTracker
+import solveBudget
+import solverWorker
+import solutionCache
 import time
 
+# Solutions of every board seen so far are kept here, so they are never solved twice
+SOLUTION_CACHE_FILE = "solvedPuzzles.sqlite"
+
 # Load model once at startup for better efficiency
 print("Loading neural network model...")
 input_shape = (28, 28, 1)
@@ -71,6 +80,19 @@ def main():
     fps = 0
     prev_time = time.time()
     
+    # Solve the puzzles on a background thread so the video never waits for the solver
+    solution_cache = solutionCache.SolutionCache(path=SOLUTION_CACHE_FILE, canonical=True)
+    solver_worker = solverWorker.SolverWorker(cache=solution_cache)
+
+    # Vote the recognized digits over the last frames to stop them from flickering
+    digit_voter = digitVoting.DigitVoter()
+
+    # Cells that look the same as before reuse their classification instead of going to the model
+    recognition_cache = recognitionCache.RecognitionCache()
+
+    # Follow the board with optical flow instead of finding it again in every frame
+    board_tracker = boardTracker.BoardTracker()
+
     # Let's turn on webcam
     old_sudoku = None
     
@@ -87,7 +109,10 @@ def main():
                 prev_time = current_time
             
             # Process frame and solve Sudoku
-            sudoku_frame = realTimeSudokuSolver.recognize_and_solve_sudoku(frame, model, old_sudoku)
+            sudoku_frame = realTimeSudokuSolver.recognize_and_solve_sudoku(frame, model, old_sudoku, solver_worker,
+                                                                          digit_voter=digit_voter,
+                                                                          recognition_cache=recognition_cache,
+                                                                          board_tracker=board_tracker)
             
             # Add FPS counter to the frame
             cv2.putText(sudoku_frame, f"FPS: {fps}", (10, 30),
@@ -104,8 +129,23 @@ def main():
             break
     
     # Clean up
+    solver_worker.stop()
+    solution_cache.close()
     cap.release()
     cv2.destroyAllWindows()
 
+    counters = solveBudget.budget_counters
+    print(f"Solver budgets hit: {counters['time']} timed out, {counters['nodes']} too many nodes, "
+          f"{counters['cancelled']} cancelled")
+    print(f"Solution cache: {solution_cache.hits} hits, {solution_cache.disk_hits} from disk, "
+          f"{solution_cache.misses} misses ({solution_cache.hit_rate():.0%} hit rate)")
+    print(f"Recognition cache: {recognition_cache.hits} hits, {recognition_cache.misses} misses "
+          f"({recognition_cache.hit_rate():.0%} hit rate)")
+    print(f"Board tracked in {board_tracker.tracked} frames, found {board_tracker.detected} times, "
+          f"lost {board_tracker.lost} times")
+    print(f"Stabilized grid changed {digit_voter.changes} times in {digit_voter.frames} frames")
+    print(f"Difficulty cache: {solution_cache.difficulty_hits} hits, {solution_cache.difficulty_misses} misses "
+          f"({solution_cache.difficulty_hit_rate():.0%} hit rate)")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
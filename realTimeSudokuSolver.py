@@ -2,7 +2,6 @@
 
 import cv2
 import numpy as np
-from scipy import ndimage
 import math
 import tensorflow as tf
 import keras
@@ -11,7 +10,10 @@ from keras.layers import Dense, Dropout, Flatten
 from keras.layers import Conv2D, MaxPooling2D
 import sudokuSolver
 import sudokuDifficulty
+import gridRepair
+from candidateGrid import CandidateGrid
 import copy
+from collections import OrderedDict
 import time
 import os
 
@@ -73,6 +75,27 @@ def write_solution_on_image(image, grid, user_grid, difficulty=None):
                                 font, font_scale, (0, 255, 0), thickness=2, lineType=cv2.LINE_AA)
     return image
 
+# Draw a box around each of the given (row, col) cells of the warped board
+def highlight_cells_on_image(image, cells, color=(0, 0, 255)):
+    width = image.shape[1] // 9
+    height = image.shape[0] // 9
+    for i, j in cells:
+        cv2.rectangle(image, (j*width + 2, i*height + 2), ((j+1)*width - 2, (i+1)*height - 2), color, 3)
+    return image
+
+# Apply inverse perspective transform and paste the warped board on top of the orginal image
+def paste_warp_on_image(image, warp, perspective_transformed_matrix):
+    result_sudoku = cv2.warpPerspective(warp, perspective_transformed_matrix, (image.shape[1], image.shape[0]), flags=cv2.WARP_INVERSE_MAP)
+    return np.where(result_sudoku.sum(axis=-1,keepdims=True)!=0, result_sudoku, image)
+
+# Return if every digit of the grid matches the solution, i.e. the solution also solves that grid
+def solution_fits_grid(solution, grid):
+    for i in range(9):
+        for j in range(9):
+            if grid[i][j] != 0 and grid[i][j] != solution[i][j]:
+                return False
+    return True
+
 # Compare every single elements of 2 matrices and return if all corresponding entries are equal
 def two_matrices_are_equal(matrix_1, matrix_2, row, col):
     for i in range(row):
@@ -99,33 +122,6 @@ def side_lengths_are_too_different(A, B, C, D, eps_scale):
 def approx_90_degrees(angle, epsilon):
     return abs(angle - 90) < epsilon
 
-# This function is used for seperating the digit from noise in "crop_image"
-# The Sudoku board will be chopped into 9x9 small square image,
-# each of those image is a "crop_image"
-def largest_connected_component(image):
-    image = image.astype('uint8')
-    nb_components, output, stats, centroids = cv2.connectedComponentsWithStats(image, connectivity=8)
-    sizes = stats[:, -1]
-
-    if(len(sizes) <= 1):
-        blank_image = np.zeros(image.shape)
-        blank_image.fill(255)
-        return blank_image
-
-    max_label = 1
-    # Start from component 1 (not 0) because we want to leave out the background
-    max_size = sizes[1]     
-
-    for i in range(2, nb_components):
-        if sizes[i] > max_size:
-            max_label = i
-            max_size = sizes[i]
-
-    img2 = np.zeros(output.shape)
-    img2.fill(255)
-    img2[output == max_label] = 0
-    return img2
-
 # Return the angle between 2 vectors in degrees
 def angle_between(vector_1, vector_2):
     unit_vector_1 = vector_1 / np.linalg.norm(vector_1)
@@ -134,23 +130,83 @@ def angle_between(vector_1, vector_2):
     angle = np.arccos(dot_droduct)
     return angle * 57.2958  # Convert to degree
 
-# Calculate how to centralize the image using its center of mass
-def get_best_shift(img):
-    cy, cx = ndimage.measurements.center_of_mass(img)
-    rows, cols = img.shape
-    shiftx = np.round(cols/2.0-cx).astype(int)
-    shifty = np.round(rows/2.0-cy).astype(int)
-    return shiftx, shifty
-
-# Shift the image using what get_best_shift returns
-def shift(img,sx,sy):
-    rows,cols = img.shape
-    M = np.float32([[1,0,sx],[0,1,sy]])
-    shifted = cv2.warpAffine(img,M,(cols,rows))
-    return shifted
+# Width of the downscaled frame the board is looked for in (about, the frame is shrunk by a
+# whole factor, which is a lot faster for cv2.INTER_AREA)
+DETECTION_WIDTH = 640
+
+# Half size of the window (in pixels of the full frame) the corners are refined in,
+# it has to cover the error of a corner found on the downscaled frame
+CORNER_WINDOW = 16
+
+# Whole factor the frame is downscaled by to be about detection_width wide
+def detection_factor(image, detection_width=DETECTION_WIDTH):
+    return max(1, round(image.shape[1] / detection_width))
+
+# Find the contour of the Sudoku board, assuming it is the BIGGEST contour of the frame
+# The frame is downscaled to about detection_width first: gray, blur, threshold and findContours
+# cost a fraction of the full frame, and only the outer contours are needed
+# Return the contour in the coordinates of the full frame, None if there is none
+def find_board_contour(image, detection_width=DETECTION_WIDTH):
+    factor = detection_factor(image, detection_width)
+    small = image
+    if factor > 1:
+        small = cv2.resize(image, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA)
+
+    # Convert to a gray image, blur that gray image for easier detection
+    # and apply adaptiveThreshold
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (5,5), 0)
+    thresh = cv2.adaptiveThreshold(blur, 255, 1, 1, 11, 2)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    biggest_contour = max(contours, key=cv2.contourArea)
+    if cv2.contourArea(biggest_contour) == 0:
+        return None
+    return np.round((biggest_contour + 0.5) * factor - 0.5).astype(np.int32)
+
+# Refine the corners of the board found on the downscaled frame on the full frame
+# In a small window around every corner, the full frame gets the same gray, blur and threshold
+# as the downscaled one, and the corner moves to the point of the board outline that is farthest
+# out from the center of the board. The outline is the contour containing the corner (or the
+# nearest one): on small boards a digit of a corner cell can be bigger than the piece of outline
+# in the window. A corner that would move more than max_move pixels (the downscaled corner is never
+# that far off) keeps its position
+# Return the corners as a float32 (4, 2) array
+def refine_corners(image, corners, max_move, window=CORNER_WINDOW):
+    refined = corners.reshape(-1, 2).astype("float32")
+    center = refined.mean(axis=0)
+    for k, (x, y) in enumerate(refined):
+        left = max(0, int(x) - window)
+        top = max(0, int(y) - window)
+        patch = image[top:int(y) + window + 1, left:int(x) + window + 1]
+        if min(patch.shape[:2]) < 5:
+            continue    # Outside the frame, keep the corner as it is
+        gray = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+        blur = cv2.GaussianBlur(gray, (5,5), 0)
+        thresh = cv2.adaptiveThreshold(blur, 255, 1, 1, 11, 2)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if not contours:
+            continue
+        corner = (float(x - left), float(y - top))
+        outline = max(contours, key=lambda c: cv2.pointPolygonTest(c, corner, True)).reshape(-1, 2)
+        outward = refined[k] - center
+        point = outline[np.argmax(outline @ outward)] + (left, top)
+        if np.abs(point - refined[k]).max() <= max_move:
+            refined[k] = point
+    return refined
+
+# Smallest fit_quadrilateral score to trust the bisection fit, below it the board is fitted with
+# get_corners_from_contours instead (a square in a circle scores 0.64)
+# Calibrated on every 4th frame of screenshots/demo.mp4 (3 crops of the camera view): every quad
+# that passed board_shape_problem scored 0.90 or more, and synthetic boards under random
+# perspective score 0.92 or more. Quads that fail the shape check score anywhere between 0.70
+# and 0.99, so the score only picks the fit, board_shape_problem rejects the shape
+MIN_QUAD_FIT = 0.90
 
 # Get 4 corners from contour.
 # These 4 corners will be the corners of the Sudoku board
+# epsilon of cv2.approxPolyDP starts at the whole perimeter and moves by 1% of it per step
 def get_corners_from_contours(contours, corner_amount=4, max_iter=200):
     coefficient = 1
     while max_iter > 0 and coefficient >= 0:
@@ -169,67 +225,32 @@ def get_corners_from_contours(contours, corner_amount=4, max_iter=200):
                 coefficient -= .01
     return None
 
-# Prepare and normalize the image to get ready for digit recognition
-def prepare(img_array):
-    new_array = img_array.reshape(-1, 28, 28, 1)
-    new_array = new_array.astype('float32')
-    new_array /= 255
-    return new_array
-
-def showImage(img, name, width, height):
-    new_image = np.copy(img)
-    new_image = cv2.resize(new_image, (width, height))
-    cv2.imshow(name, new_image)
-
-# Variable to track the last saved grid hash to avoid repeated saves
-last_grid_hash = None
-
-# This function take a webcam image, find the Sudoku board, 
-# recognizing digits, solve the Sudoku puzzle and
-# print the result back on the image, and then return that image
-def recognize_and_solve_sudoku(image, model, old_sudoku):
-    global last_grid_hash
-    
-    # Most of the existing code remains the same...
-    clone_image = np.copy(image)
-    
-    # Convert to a gray image, blur that gray image for easier detection
-    # and apply adaptiveThreshold
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    blur = cv2.GaussianBlur(gray, (5,5), 0)
-    thresh = cv2.adaptiveThreshold(blur, 255, 1, 1, 11, 2)
-
-    # Find all contours
-    contours, _ = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-    
-    # And extract the biggest one, assuming the Sudoku board is the BIGGEST contour
-    max_area = 0
-    biggest_contour = None
-    for c in contours:
-        area = cv2.contourArea(c)
-        if area > max_area:
-            max_area = area
-            biggest_contour = c
-
-    if biggest_contour is None:        # If no sudoku
-        # Add status message to the image
-        cv2.putText(image, "No Sudoku detected", (20, image.shape[0] - 40), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
-        return image
-
-    # Get 4 corners of the biggest contour
-    corners = get_corners_from_contours(biggest_contour, 4)
-
-    if corners is None:         # If no sudoku
-        # Add status message to the image
-        cv2.putText(image, "No valid Sudoku board detected", (20, image.shape[0] - 40), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
-        return image
-
-    # Highlight the detected board
-    cv2.drawContours(image, [corners], 0, (0, 255, 0), 2)
+# Fit the 4 corners of the Sudoku board to its contour, in a few steps
+# The contour is replaced by its convex hull, then epsilon of cv2.approxPolyDP is bisected between
+# 0 (every hull point is kept) and the perimeter of the hull (nothing is left) until exactly
+# 4 points are left. The hull is convex, so the approximation is too.
+# Return the corners ordered by order_corners and the fit quality: the area of the quadrilateral
+# divided by the area of the hull (1 for a perfect fit), or None and 0 if no fit was found
+def fit_quadrilateral(contour, max_iter=30):
+    hull = cv2.convexHull(contour)
+    perimeter = cv2.arcLength(hull, True)
+    low, high = 0.0, perimeter
+    for _ in range(max_iter):
+        epsilon = (low + high) / 2
+        poly_approx = cv2.approxPolyDP(hull, epsilon, True)
+        if len(poly_approx) == 4:
+            hull_area = cv2.contourArea(hull)
+            fit = cv2.contourArea(poly_approx) / hull_area if hull_area > 0 else 0.0
+            return order_corners(poly_approx), fit
+        if len(poly_approx) > 4:
+            low = epsilon
+        else:
+            high = epsilon
+    return None, 0.0
 
-    # Now we have 4 corners, locate the top left, top right, bottom left and bottom right corners
+# Locate the top left, top right, bottom right and bottom left corners among 4 corners
+# Return them as a float32 (4, 2) array in that order
+def order_corners(corners):
     rect = np.zeros((4, 2), dtype = "float32")
     corners = corners.reshape(4,2)
 
@@ -261,8 +282,11 @@ def recognize_and_solve_sudoku(image, model, old_sudoku):
         rect[1] = corners[1]
         rect[3] = corners[0]
 
-    rect = rect.reshape(4,2)
+    return rect.reshape(4,2)
 
+# Check that the corners A B C D (ordered by order_corners) can be those of a Sudoku board
+# Return None if they can, the message to show otherwise
+def board_shape_problem(rect):
     # After having found 4 corners A B C D, check if ABCD is approximately square
     #   A------B
     #   |      |
@@ -282,19 +306,354 @@ def recognize_and_solve_sudoku(image, model, old_sudoku):
     eps_angle = 20
     if not (approx_90_degrees(angle_between(AB,AD), eps_angle) and approx_90_degrees(angle_between(AB,BC), eps_angle)
     and approx_90_degrees(angle_between(BC,DC), eps_angle) and approx_90_degrees(angle_between(AD,DC), eps_angle)):
-        # Add status message to the image
-        cv2.putText(image, "Not a valid Sudoku board shape", (20, image.shape[0] - 40), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
-        return image
+        return "Not a valid Sudoku board shape"
     
     # 2nd condition: The Lengths of AB, AD, BC, DC have to be approximately equal
     # => Longest and shortest sides have to be approximately equal
     eps_scale = 1.2     # Longest cannot be longer than epsScale * shortest
     if(side_lengths_are_too_different(A, B, C, D, eps_scale)):
+        return "Sudoku board is too skewed"
+    return None
+
+# Find the Sudoku board in the frame
+# Return its corners ordered by order_corners, or None and the message to show if there is no board
+def detect_board(image):
+    # Look for the board on a downscaled copy of the frame
+    biggest_contour = find_board_contour(image)
+    if biggest_contour is None:
+        return None, "No Sudoku detected"
+
+    # Get 4 corners of the biggest contour
+    corners, fit = fit_quadrilateral(biggest_contour)
+    if corners is None or fit < MIN_QUAD_FIT:
+        # The hull has a bump (a finger, a shadow), fall back to the approximation of the contour itself
+        corners = get_corners_from_contours(biggest_contour, 4)
+        if corners is None:
+            return None, "No valid Sudoku board detected"
+
+    # The corners were found on the downscaled frame, move them to their exact position on the full frame
+    return order_corners(refine_corners(image, corners, detection_factor(image) + 1)), None
+
+# Size of the digit images the CNN was trained on
+DIGIT_SIZE = 28
+
+# Every cell of the board is resampled to CELL_SAMPLE x CELL_SAMPLE pixels, the CELL_MARGIN pixels
+# on every side hold the boundaries and are left out, the rest is the DIGIT_SIZE x DIGIT_SIZE digit image
+CELL_MARGIN = 3
+CELL_SAMPLE = DIGIT_SIZE + 2 * CELL_MARGIN
+
+# A row or column near the edge of a cell with more than this fraction of black pixels is a grid line
+LINE_RATIO = 0.6
+
+# Side in pixels of the board warp used for recognition: one lattice cell per board cell
+RECOGNITION_SIZE = 9 * CELL_SAMPLE
+
+# Warp the board with corners rect (top left, top right, bottom right, bottom left)
+# to a width x height top-down, "birds eye" view
+# Return the warp and the perspective transform matrix (for paste_warp_on_image)
+def warp_board(image, rect, width, height):
+    dst = np.array([
+        [0, 0],
+        [width - 1, 0],
+        [width - 1, height - 1],
+        [0, height - 1]], dtype="float32")
+    perspective_transformed_matrix = cv2.getPerspectiveTransform(rect, dst)
+    return cv2.warpPerspective(image, perspective_transformed_matrix, (width, height)), perspective_transformed_matrix
+
+# Warp the board to size x size pixels and threshold it to get ready for recognizing digits
+# The default size maps every cell straight onto the lattice of extract_digit_cells, so the cost
+# of recognition is the same for every frame, however close the board is to the camera.
+# size None warps the board to its size in the frame instead
+def recognition_warp(image, rect, size=RECOGNITION_SIZE):
+    if size is None:
+        (tl, tr, br, bl) = rect
+        width = int(max(np.linalg.norm(br - bl), np.linalg.norm(tr - tl)))
+        height = int(max(np.linalg.norm(tr - br), np.linalg.norm(tl - bl)))
+    else:
+        width = height = size
+    warp, _ = warp_board(image, rect, width, height)
+    warp = cv2.cvtColor(warp,cv2.COLOR_BGR2GRAY)
+    warp = cv2.GaussianBlur(warp, (5,5), 0)
+    warp = cv2.adaptiveThreshold(warp, 255, 1, 1, 11, 2)
+    warp = cv2.bitwise_not(warp)
+    _, warp = cv2.threshold(warp, 150, 255, cv2.THRESH_BINARY)
+    return warp
+
+# Keep only the largest connected component of every cell image (the digit, not the noise)
+# ink is a (N, DIGIT_SIZE, DIGIT_SIZE) bool array. All cells are laid out as one image with a
+# white pixel between them, so a single connectedComponentsWithStats call labels every cell
+def largest_connected_components(ink):
+    count = len(ink)
+    side = DIGIT_SIZE + 1
+    columns = 9
+    rows = -(-count // columns)
+    padded = np.zeros((rows * columns, side, side), dtype=np.uint8)
+    padded[:count, :DIGIT_SIZE, :DIGIT_SIZE] = ink
+    mosaic = padded.reshape(rows, columns, side, side).swapaxes(1, 2).reshape(rows * side, columns * side)
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(mosaic, connectivity=8)
+
+    # Cell of every component (component 0 is the background), and the largest component of every cell
+    cell_of = stats[1:, cv2.CC_STAT_TOP] // side * columns + stats[1:, cv2.CC_STAT_LEFT] // side
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    largest_area = np.zeros(rows * columns, dtype=int)
+    np.maximum.at(largest_area, cell_of, areas)
+    largest_label = np.zeros(rows * columns, dtype=int)
+    winners = np.flatnonzero(areas == largest_area[cell_of])
+    largest_label[cell_of[winners]] = winners + 1
+
+    labels = labels.reshape(rows, side, columns, side).swapaxes(1, 2).reshape(rows * columns, side, side)
+    labels = labels[:count, :DIGIT_SIZE, :DIGIT_SIZE]
+    return (labels == largest_label[:count, np.newaxis, np.newaxis]) & ink
+
+# Shift every cell image so the center of mass of its digit is in the middle
+# ink is a (N, DIGIT_SIZE, DIGIT_SIZE) bool array with at least one black pixel per image
+def center_digits(ink):
+    positions = np.arange(DIGIT_SIZE)
+    counts = ink.sum(axis=(1, 2))
+    center_y = (ink.sum(axis=2) * positions).sum(axis=1) / counts
+    center_x = (ink.sum(axis=1) * positions).sum(axis=1) / counts
+    shift_y = np.round(DIGIT_SIZE / 2.0 - center_y).astype(int)
+    shift_x = np.round(DIGIT_SIZE / 2.0 - center_x).astype(int)
+
+    # Pixel (y, x) of the shifted image comes from (y - shift_y, x - shift_x), white outside the cell
+    source_y = positions - shift_y[:, np.newaxis]
+    source_x = positions - shift_x[:, np.newaxis]
+    inside = ((source_y >= 0) & (source_y < DIGIT_SIZE))[:, :, np.newaxis] & \
+             ((source_x >= 0) & (source_x < DIGIT_SIZE))[:, np.newaxis, :]
+    shifted = ink[np.arange(len(ink))[:, np.newaxis, np.newaxis],
+                  np.clip(source_y, 0, DIGIT_SIZE - 1)[:, :, np.newaxis],
+                  np.clip(source_x, 0, DIGIT_SIZE - 1)[:, np.newaxis, :]]
+    return shifted & inside
+
+# Number of leading True values along the last axis
+def leading_count(flags):
+    return np.cumprod(flags, axis=-1).sum(axis=-1)
+
+# Chop the thresholded Sudoku board into 9x9 cells and prepare every non-empty cell
+# for digit recognition. Return a (N, 28, 28, 1) batch of digit images and
+# the (row, col) position of each of them on the board
+# The board is resampled once to a lattice of 9x9 cells, then every step works on all cells at once
+def extract_digit_cells(warp):
+    SIZE = 9
+
+    # Resample the whole board at once (a recognition_warp already has the size of the lattice),
+    # then cut the lattice into (81, CELL_SAMPLE, CELL_SAMPLE) cells
+    lattice = warp
+    if warp.shape != (SIZE * CELL_SAMPLE, SIZE * CELL_SAMPLE):   # Not a recognition_warp of RECOGNITION_SIZE
+        lattice = cv2.resize(warp, (SIZE * CELL_SAMPLE, SIZE * CELL_SAMPLE), interpolation=cv2.INTER_AREA)
+    cells = lattice.reshape(SIZE, CELL_SAMPLE, SIZE, CELL_SAMPLE).swapaxes(1, 2)
+    cells = cells.reshape(SIZE * SIZE, CELL_SAMPLE, CELL_SAMPLE)[:, CELL_MARGIN:-CELL_MARGIN, CELL_MARGIN:-CELL_MARGIN]
+    ink = cells < 200   # Digits are black on the thresholded board
+
+    # There are still some boundary lines left though
+    # => Remove all black lines near the edges, up to the first line which is not a black line
+    row_lines = ink.mean(axis=2) > LINE_RATIO
+    col_lines = ink.mean(axis=1) > LINE_RATIO
+    positions = np.arange(DIGIT_SIZE)
+    keep_rows = (positions >= leading_count(row_lines)[:, np.newaxis]) & \
+                (positions < DIGIT_SIZE - leading_count(row_lines[:, ::-1])[:, np.newaxis])
+    keep_cols = (positions >= leading_count(col_lines)[:, np.newaxis]) & \
+                (positions < DIGIT_SIZE - leading_count(col_lines[:, ::-1])[:, np.newaxis])
+    ink &= keep_rows[:, :, np.newaxis] & keep_cols[:, np.newaxis, :]
+
+    # Take the largest connected component (The digit), and remove all noises
+    ink = largest_connected_components(ink)
+
+    # Leave the white cells out of the batch:
+    # Criteria 1 for detecting white cell: has too little black pixels
+    # Criteria 2 for detecting white cell: huge white area in the center
+    quarter = DIGIT_SIZE // 4
+    center_ink = ink[:, quarter:DIGIT_SIZE - quarter, quarter:DIGIT_SIZE - quarter].sum(axis=(1, 2))
+    digits = np.flatnonzero((ink.sum(axis=(1, 2)) > DIGIT_SIZE) & (center_ink > 1))
+
+    # Centralize the images according to center of mass and convert them to the format of the model
+    ink = center_digits(ink[digits])
+    digit_batch = np.where(ink, 0.0, 1.0).astype("float32")[:, :, :, np.newaxis]
+    cell_positions = [(int(k) // SIZE, int(k) % SIZE) for k in digits]
+    return digit_batch, cell_positions
+
+# Classify all digit images with ONE model call instead of one call per cell
+# Return the predicted digits (1-9) and the probabilities of every class for each image
+def classify_digits(model, digit_batch):
+    if len(digit_batch) == 0:
+        return np.zeros(0, dtype=int), np.zeros((0, 9), dtype="float32")
+    probabilities = np.asarray(model.predict(digit_batch, verbose=0)) # model is trained by digitRecognition.py
+    labels = np.argmax(probabilities, axis=1) + 1   # 1 2 3 4 5 6 7 8 9 starts from 0, so add 1
+    return labels, probabilities
+
+# Recognize all digits on the thresholded Sudoku board
+# Return the 9x9 grid (0 = empty cell) and the 9x9x9 class probabilities of every cell
+# (all zeros for empty cells)
+# With a recognitionCache.RecognitionCache, only the cells it hasn't seen go to the model
+def recognize_digits(warp, model, recognition_cache=None):
+    SIZE = 9
+    digit_batch, cell_positions = extract_digit_cells(warp)
+    if recognition_cache is not None:
+        labels, probabilities = recognition_cache.classify(model, digit_batch, cell_positions, classify_digits)
+    else:
+        labels, probabilities = classify_digits(model, digit_batch)
+
+    grid = [[0] * SIZE for _ in range(SIZE)]
+    cell_probabilities = np.zeros((SIZE, SIZE, 9), dtype="float32")
+    for k, (i, j) in enumerate(cell_positions):
+        grid[i][j] = int(labels[k])
+        cell_probabilities[i, j] = probabilities[k]
+    return grid, cell_probabilities
+
+def showImage(img, name, width, height):
+    new_image = np.copy(img)
+    new_image = cv2.resize(new_image, (width, height))
+    cv2.imshow(name, new_image)
+
+# Variable to track the last saved grid hash to avoid repeated saves
+last_grid_hash = None
+
+# Budget of a solve inside the frame loop (when there is no background solver worker).
+# A misread grid can be consistent but unsolvable and make the solver explore a huge tree,
+# so give up instead of freezing the video
+SOLVE_TIME_LIMIT = 0.3    # Seconds
+SOLVE_MAX_NODES = 200000
+# Seconds a repaired grid may take to solve on the frame thread. Counting the solutions of the
+# boards of sudokuBenchmark.HARD_PUZZLES takes 8-70 ms, a repaired grid is as hard as the board
+REPAIR_TIME_LIMIT = 0.1
+# With a solver worker, a repaired grid only gets this many seconds on the frame thread,
+# the worker solves the slower ones in the background
+REPAIR_HANDOFF_TIME = 0.01
+# Seconds all the repairs of one frame may take together, more than REPAIR_TIME_LIMIT so the first
+# grid that isn't in the cache always gets its whole budget and a search cut short makes progress
+REPAIR_FRAME_BUDGET = 0.15
+MAX_REMEMBERED_REPAIRS = 32
+remembered_repairs = OrderedDict()  # Grid string -> gridRepair.Repair (None if it couldn't be repaired)
+timed_out_repairs = OrderedDict()   # Grid string -> SolveResult of repaired grids that ran out of REPAIR_TIME_LIMIT
+last_solve = None   # (grid string, SolveResult) of the last grid solved, reused while the stabilized grid stays the same
+
+# Solve a grid produced by gridRepair on the frame thread with a small budget,
+# going through the results cache (if any) like the grids that were read as they are
+# A timeout on this small budget says nothing about the grid, so it isn't cached: the
+# results cache may be the solver worker's, which would then never solve that grid.
+# With a solver worker (whose results are the results cache), a grid that doesn't solve within
+# REPAIR_HANDOFF_TIME is submitted to the worker and found in the cache on a later frame
+# Raise SolveBudgetExceeded when the grid can't be answered on this frame: it is waiting for the
+# worker, or time_limit (what is left of the frame budget) cut the solve short
+def solve_repaired_grid(grid, results_cache=None, time_limit=None, solver_worker=None):
+    key = sudokuSolver.grid_to_string(grid)
+    result = results_cache.get(grid) if results_cache is not None else None
+    if result is None:
+        result = timed_out_repairs.get(key)
+    if result is not None:
+        return result
+    if solver_worker is not None and solver_worker.is_waiting(grid):
+        raise sudokuSolver.SolveBudgetExceeded("time", "Repaired grid is being solved by the solver worker")
+
+    limit = REPAIR_HANDOFF_TIME if solver_worker is not None else REPAIR_TIME_LIMIT
+    cut_short = time_limit is not None and time_limit < limit
+    result = sudokuSolver.solve_grid(grid, min(time_limit, limit) if cut_short else limit, SOLVE_MAX_NODES)
+    if result.status != "timeout":
+        if results_cache is not None:
+            results_cache.put(grid, result)
+        return result
+    if solver_worker is not None:
+        solver_worker.submit(grid)
+        raise sudokuSolver.SolveBudgetExceeded("time", "Repaired grid handed to the solver worker")
+    if cut_short and result.reason == "time":
+        raise sudokuSolver.SolveBudgetExceeded("time", "Repair budget of the frame used up")
+
+    # Ran out of its whole budget, don't spend it again on every frame
+    timed_out_repairs[key] = result
+    if len(timed_out_repairs) > MAX_REMEMBERED_REPAIRS:
+        timed_out_repairs.popitem(last=False)
+    return result
+
+# Repair a misread grid (see gridRepair): first change the least confident conflicting digit,
+# then search the top-k classes of all digits in order of likelihood.
+# The outcome is remembered per grid, so a board that stays in view is only searched once.
+# Both steps share one deadline of REPAIR_FRAME_BUDGET seconds, so a frame can't stall on repairs.
+# A search that runs out of time (or waits for the solver worker) isn't remembered, the next frame
+# searches again with a fresh budget and finds the grids solved so far in the results cache.
+# Return a gridRepair.Repair, None if no repair with exactly one solution was found (yet)
+def find_repair(grid, cell_probabilities, conflicts, results_cache=None, allow_removal=True, solver_worker=None):
+    key = sudokuSolver.grid_to_string(grid)
+    if key in remembered_repairs:
+        remembered_repairs.move_to_end(key)
+        return remembered_repairs[key]
+
+    solve = lambda repaired, time_limit: solve_repaired_grid(repaired, results_cache, time_limit, solver_worker)
+    deadline = time.perf_counter() + REPAIR_FRAME_BUDGET
+    repair = None
+    try:
+        if conflicts:
+            repair = gridRepair.repair_conflicts(grid, cell_probabilities, conflicts, solve, REPAIR_FRAME_BUDGET)
+        if repair is None:
+            repair = gridRepair.repair_search(grid, cell_probabilities, solve, allow_removal=allow_removal,
+                                              time_limit=deadline - time.perf_counter())
+    except sudokuSolver.SolveBudgetExceeded:
+        return None
+
+    remembered_repairs[key] = repair
+    if len(remembered_repairs) > MAX_REMEMBERED_REPAIRS:
+        remembered_repairs.popitem(last=False)
+    return repair
+
+def print_repair(grid, repair):
+    print(f"\nRepaired misread digits (likelihood {repair.likelihood:.2f} of the grid as read):")
+    for (i, j), digit in repair.changes:
+        print(f"  Row {i+1}, column {j+1}: {grid[i][j]} -> {digit if digit else 'removed'}")
+
+# This function take a webcam image, find the Sudoku board, 
+# recognizing digits, solve the Sudoku puzzle and
+# print the result back on the image, and then return that image
+# If a solverWorker.SolverWorker is given, solving happens on its thread and
+# the frame shows "Solving..." until the solution is published.
+# Otherwise the puzzle is solved right here, looking it up in solution_cache
+# (a solutionCache.SolutionCache) first if one is given
+# If a digitVoting.DigitVoter is given, the digits are voted over the last frames and the
+# board is only solved again when the stabilized grid changes
+# If a recognitionCache.RecognitionCache is given, cells seen before aren't classified again
+# If a boardTracker.BoardTracker is given, the board is followed with optical flow instead of
+# being found again in every frame
+def recognize_and_solve_sudoku(image, model, old_sudoku, solver_worker=None, solution_cache=None, digit_voter=None,
+                               recognition_cache=None, board_tracker=None):
+    global last_grid_hash, last_solve
+    
+    # Most of the existing code remains the same...
+    clone_image = np.copy(image)
+    
+    # Follow the board of the last frames with optical flow (see boardTracker), or find it in the
+    # frame when there is no tracker, the board was lost or it is time for a new detection
+    rect = board_tracker.track(image) if board_tracker is not None else None
+    tracked = rect is not None
+    if not tracked:
+        rect, message = detect_board(image)
+        if rect is None:        # If no sudoku
+            if board_tracker is not None:
+                board_tracker.reset()
+            if digit_voter is not None:     # The next board may be a different puzzle
+                digit_voter.reset()
+            if recognition_cache is not None:
+                recognition_cache.reset()
+            # Add status message to the image
+            cv2.putText(image, message, (20, image.shape[0] - 40), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
+            return image
+
+    # Highlight the detected board
+    cv2.drawContours(image, [np.round(rect).astype(np.int32).reshape(4, 1, 2)], 0, (0, 255, 0), 2)
+
+    # Check that the board is approximately square
+    message = board_shape_problem(rect)
+    if message is not None:
+        if board_tracker is not None:
+            board_tracker.reset()
+        if digit_voter is not None:     # The next board may be a different puzzle
+            digit_voter.reset()
+        if recognition_cache is not None:
+            recognition_cache.reset()
         # Add status message to the image
-        cv2.putText(image, "Sudoku board is too skewed", (20, image.shape[0] - 40), 
+        cv2.putText(image, message, (20, image.shape[0] - 40), 
                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
         return image
+    if board_tracker is not None and not tracked:
+        board_tracker.start(clone_image, rect)     # The frame without the highlight drawn on it
     
     # Now we are sure ABCD correspond to 4 corners of a Sudoku board
 
@@ -312,128 +671,44 @@ def recognize_and_solve_sudoku(image, model, old_sudoku):
     max_width = max(int(width_A), int(width_B))
     max_height = max(int(height_A), int(height_B))
 
-    # construct our destination points which will be used to
-    # map the screen to a top-down, "birds eye" view
-    dst = np.array([
-	    [0, 0],
-	    [max_width - 1, 0],
-	    [max_width - 1, max_height - 1],
-	    [0, max_height - 1]], dtype = "float32")
-
-    # calculate the perspective transform matrix and warp
-    # the perspective to grab the screen
-    perspective_transformed_matrix = cv2.getPerspectiveTransform(rect, dst)
-    warp = cv2.warpPerspective(image, perspective_transformed_matrix, (max_width, max_height))
-    orginal_warp = np.copy(warp)
-
-    # At this point, warp contains ONLY the chopped Sudoku board
-    # Do some image processing to get ready for recognizing digits
-    warp = cv2.cvtColor(warp,cv2.COLOR_BGR2GRAY)
-    warp = cv2.GaussianBlur(warp, (5,5), 0)
-    warp = cv2.adaptiveThreshold(warp, 255, 1, 1, 11, 2)
-    warp = cv2.bitwise_not(warp)
-    _, warp = cv2.threshold(warp, 150, 255, cv2.THRESH_BINARY)
-
-    # Init grid to store Sudoku Board digits
-    SIZE = 9
-    grid = []
-    for i in range(SIZE):
-        row = []
-        for j in range(SIZE):
-            row.append(0)
-        grid.append(row)
-
-    height = warp.shape[0] // 9
-    width = warp.shape[1] // 9
-
-    offset_width = math.floor(width / 10)    # Offset is used to get rid of the boundaries
-    offset_height = math.floor(height / 10)
-    # Divide the Sudoku board into 9x9 square:
-    for i in range(SIZE):
-        for j in range(SIZE):
-
-            # Crop with offset (We don't want to include the boundaries)
-            crop_image = warp[height*i+offset_height:height*(i+1)-offset_height, width*j+offset_width:width*(j+1)-offset_width]        
-            
-            # There are still some boundary lines left though
-            # => Remove all black lines near the edges
-            # ratio = 0.6 => If 60% pixels are black, remove
-            # Notice as soon as we reach a line which is not a black line, the while loop stops
-            ratio = 0.6        
-            # Top
-            while np.sum(crop_image[0]) <= (1-ratio) * crop_image.shape[1] * 255:
-                crop_image = crop_image[1:]
-            # Bottom
-            while np.sum(crop_image[:,-1]) <= (1-ratio) * crop_image.shape[1] * 255:
-                crop_image = np.delete(crop_image, -1, 1)
-            # Left
-            while np.sum(crop_image[:,0]) <= (1-ratio) * crop_image.shape[0] * 255:
-                crop_image = np.delete(crop_image, 0, 1)
-            # Right
-            while np.sum(crop_image[-1]) <= (1-ratio) * crop_image.shape[0] * 255:
-                crop_image = crop_image[:-1]    
-
-            # Take the largestConnectedComponent (The digit), and remove all noises
-            crop_image = cv2.bitwise_not(crop_image)
-            crop_image = largest_connected_component(crop_image)
-           
-            # Resize
-            digit_pic_size = 28
-            crop_image = cv2.resize(crop_image, (digit_pic_size,digit_pic_size))
-
-            # If this is a white cell, set grid[i][j] to 0 and continue on the next image:
-
-            # Criteria 1 for detecting white cell:
-            # Has too little black pixels
-            if crop_image.sum() >= digit_pic_size**2*255 - digit_pic_size * 1 * 255:
-                grid[i][j] == 0
-                continue    # Move on if we have a white cell
-
-            # Criteria 2 for detecting white cell
-            # Huge white area in the center
-            center_width = crop_image.shape[1] // 2
-            center_height = crop_image.shape[0] // 2
-            x_start = center_height // 2
-            x_end = center_height // 2 + center_height
-            y_start = center_width // 2
-            y_end = center_width // 2 + center_width
-            center_region = crop_image[x_start:x_end, y_start:y_end]
-            
-            if center_region.sum() >= center_width * center_height * 255 - 255:
-                grid[i][j] = 0
-                continue    # Move on if we have a white cell
-            
-            # Now we are quite certain that this crop_image contains a number
+    # Digits are recognized on a warp of constant resolution, whatever the distance to the camera.
+    # The overlay is drawn on a (max_width, max_height) warp, only made when there is something to draw
+    warp = recognition_warp(image, rect)
 
-            # Store the number of rows and cols
-            rows, cols = crop_image.shape
-
-            # Apply Binary Threshold to make digits more clear
-            _, crop_image = cv2.threshold(crop_image, 200, 255, cv2.THRESH_BINARY) 
-            crop_image = crop_image.astype(np.uint8)
-
-            # Centralize the image according to center of mass
-            crop_image = cv2.bitwise_not(crop_image)
-            shift_x, shift_y = get_best_shift(crop_image)
-            shifted = shift(crop_image,shift_x,shift_y)
-            crop_image = shifted
-
-            crop_image = cv2.bitwise_not(crop_image)
-            
-            # Convert to proper format to recognize
-            crop_image = prepare(crop_image)
+    # Recognize every digit of the board in a single batched inference
+    grid, cell_probabilities = recognize_digits(warp, model, recognition_cache)
 
-            # Recognize digits
-            prediction = model.predict([crop_image]) # model is trained by digitRecognition.py
-            grid[i][j] = np.argmax(prediction[0]) + 1 # 1 2 3 4 5 6 7 8 9 starts from 0, so add 1
+    # Vote over the last frames, so a digit misread in a single frame doesn't flip the board
+    grid_changed = True
+    if digit_voter is not None:
+        grid, cell_probabilities, grid_changed = digit_voter.update(grid, cell_probabilities)
 
     user_grid = copy.deepcopy(grid)
     
     # Create a hash of the grid to identify unique puzzles
     grid_hash = hash(str(grid))
     
-    # Check if the puzzle is valid
-    is_valid, error_message = sudokuDifficulty.is_valid_sudoku(grid)
+    # Candidates of every cell, computed once and shared by validation, grading and solving
+    candidates = CandidateGrid(grid)
+
+    # Check if the puzzle is valid, finding every repeated digit at once
+    conflicts = sudokuDifficulty.find_conflicts(grid)
+    is_valid, error_message = sudokuDifficulty.is_valid_sudoku(grid, candidates, conflicts)
+
+    # An invalid grid most likely has a misread digit: try the most likely repairs
+    # and solve the repaired grid right away
+    results_cache = solver_worker.results if solver_worker is not None else solution_cache
+    repair = None
+    if not is_valid:
+        repair = find_repair(grid, cell_probabilities, conflicts, results_cache, solver_worker=solver_worker)
+        if repair is not None:
+            if grid_hash != last_grid_hash:
+                print_repair(grid, repair)
+            grid = copy.deepcopy(repair.grid)
+            user_grid = copy.deepcopy(grid)
+            candidates = CandidateGrid(grid)
+            conflicts = []
+            is_valid = True
     if not is_valid:
         # Display error message on the image
         cv2.putText(image, f"Invalid puzzle: {error_message}", (20, image.shape[0] - 40), 
@@ -442,51 +717,137 @@ def recognize_and_solve_sudoku(image, model, old_sudoku):
         if grid_hash != last_grid_hash:  # Only print if it's a new invalid grid
             print("\n===== INVALID SUDOKU DETECTED =====")
             print(f"Error: {error_message}")
+            if len(conflicts) > 1:
+                print(f"{len(conflicts) - 1} more conflicts")
             print_grid(grid, "Detected Invalid Grid")
             last_grid_hash = grid_hash
         
+        if not conflicts:
+            return image
+        # Highlight every cell holding a repeated digit
+        orginal_warp, perspective_transformed_matrix = warp_board(image, rect, max_width, max_height)
+        orginal_warp = highlight_cells_on_image(orginal_warp, sudokuDifficulty.conflict_cells(conflicts))
+        return paste_warp_on_image(image, orginal_warp, perspective_transformed_matrix)
+
+    # A solved copy of the grid that we'll use for terminal output
+    solved_grid = copy.deepcopy(grid)
+    was_solved = False
+    still_solving = False
+
+    if repair is not None:
+        # Already solved while repairing the grid
+        result = repair.result
+    # The stabilized grid didn't change since the last solve, keep its result
+    elif not grid_changed and last_solve is not None and last_solve[0] == sudokuSolver.grid_to_string(grid):
+        result = last_solve[1]
+    # If this is the same board as last camera frame, no need to solve it again
+    elif (not old_sudoku is None) and two_matrices_are_equal(old_sudoku, grid, 9, 9):
+        result = sudokuSolver.SolveResult("solved", 1, copy.deepcopy(old_sudoku), None)
+    elif solver_worker is not None:
+        # Solving happens on the worker thread, pick up the result once it has been published
+        result = solver_worker.get(grid)
+        if result is None:
+            solver_worker.submit(grid, candidates)
+            still_solving = True
+            # Keep showing the last solution while it still fits the board, otherwise just wait
+            last_solution = solver_worker.last_solution
+            if last_solution is None or not solution_fits_grid(last_solution, grid):
+                cv2.putText(image, "Solving...", (20, image.shape[0] - 40), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2, cv2.LINE_AA)
+                return image
+            result = sudokuSolver.SolveResult("solved", 1, copy.deepcopy(last_solution), None)
+    else:
+        # Boards we have seen before don't need to be solved again
+        result = solution_cache.get(grid) if solution_cache is not None else None
+        if result is None:
+            # Count the solutions, stopping as soon as a second one shows up. This solves it as well
+            result = sudokuSolver.solve_grid(grid, SOLVE_TIME_LIMIT, SOLVE_MAX_NODES, candidates=candidates)
+            if solution_cache is not None:
+                solution_cache.put(grid, result)
+
+    if not still_solving and result.status != "timeout":
+        last_solve = (sudokuSolver.grid_to_string(grid), result)
+
+    # No solution or several solutions: a digit was most likely misread as another one (a missing
+    # digit can't be repaired, so only with no solution removing a digit can help)
+    if repair is None and not still_solving and result.status in ("multiple", "no_solution"):
+        repair = find_repair(grid, cell_probabilities, [], results_cache,
+                             allow_removal=result.status == "no_solution", solver_worker=solver_worker)
+        if repair is not None:
+            if grid_hash != last_grid_hash:
+                print_repair(grid, repair)
+            grid = copy.deepcopy(repair.grid)
+            user_grid = copy.deepcopy(grid)
+            candidates = CandidateGrid(grid)
+            result = repair.result
+
+    if result.status == "timeout":
+        cv2.putText(image, "Solve timed out", (20, image.shape[0] - 40), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
+
+        if grid_hash != last_grid_hash:  # Only print if it's a new grid
+            print("\n===== SOLVE TIMED OUT =====")
+            print(f"Reason: {result.reason}")
+            print_grid(grid, "Detected Grid")
+            last_grid_hash = grid_hash
+
         return image
 
-    # Calculate difficulty
-    difficulty, score = sudokuDifficulty.calculate_difficulty(grid)
+    # Calculate difficulty, once per board: the worker's cache (or the given one) keeps the grade
+    difficulty_cache = solver_worker.results if solver_worker is not None else solution_cache
+    graded = difficulty_cache.get_difficulty(grid) if difficulty_cache is not None else None
+    if graded is None:
+        graded = sudokuDifficulty.calculate_difficulty(grid, result.solution_count, candidates)
+        # While still solving, the solution count is the one of the last solution, don't keep that grade
+        if difficulty_cache is not None and not still_solving:
+            difficulty_cache.put_difficulty(grid, graded)
+    difficulty, score = graded
 
     # Solve sudoku after we have recognizing each digits of the Sudoku board:
     cv2.putText(image, f"Sudoku detected - {difficulty} difficulty", (20, image.shape[0] - 40), 
                 cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
 
-    # A solved copy of the grid that we'll use for terminal output
-    solved_grid = copy.deepcopy(grid)
-    was_solved = False
-    
-    # If this is the same board as last camera frame
-    # Phewww, print the same solution. No need to solve it again
-    if (not old_sudoku is None) and two_matrices_are_equal(old_sudoku, grid, 9, 9):
-        if(sudokuSolver.all_board_non_zero(grid)):
-            orginal_warp = write_solution_on_image(orginal_warp, old_sudoku, user_grid, difficulty)
-            solved_grid = copy.deepcopy(old_sudoku)
-            was_solved = True
-    # If this is a different board
+    if result.status == "solved":  # If we got the one and only solution
+        solved_grid = result.solution
+        orginal_warp, perspective_transformed_matrix = warp_board(image, rect, max_width, max_height)
+        orginal_warp = write_solution_on_image(orginal_warp, solved_grid, user_grid, difficulty)
+        if repair is not None:
+            # Show which digits were read wrong
+            orginal_warp = highlight_cells_on_image(orginal_warp, [cell for cell, _ in repair.changes], (0, 165, 255))
+        old_sudoku = copy.deepcopy(solved_grid)  # Keep the old solution
+        was_solved = True
+    elif result.status == "multiple":
+        # More than one solution - a proper Sudoku has exactly one, so a digit was most likely misread
+        cv2.putText(image, "Multiple solutions - a digit may be misread", 
+                  (20, image.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 
+                  0.8, (0, 165, 255), 2, cv2.LINE_AA)
+
+        if grid_hash != last_grid_hash:  # Only print if it's a new non-unique grid
+            print("\n===== SUDOKU WITH MULTIPLE SOLUTIONS DETECTED =====")
+            print_grid(grid, "Detected Non-unique Grid")
+            last_grid_hash = grid_hash
+
+        return image
     else:
-        sudokuSolver.solve_sudoku(solved_grid)  # Solve it
-        if(sudokuSolver.all_board_non_zero(solved_grid)):  # If we got a solution
-            orginal_warp = write_solution_on_image(orginal_warp, solved_grid, user_grid, difficulty)
-            old_sudoku = copy.deepcopy(solved_grid)  # Keep the old solution
-            was_solved = True
-        else:
-            # No solution found - likely invalid input or unsolvable puzzle
-            cv2.putText(image, "No solution found - invalid or unsolvable puzzle", 
-                      (20, image.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 
-                      0.8, (0, 0, 255), 2, cv2.LINE_AA)
+        # No solution found - likely invalid input or unsolvable puzzle
+        cv2.putText(image, "No solution found - invalid or unsolvable puzzle", 
+                  (20, image.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 
+                  0.8, (0, 0, 255), 2, cv2.LINE_AA)
+        
+        if grid_hash != last_grid_hash:  # Only print if it's a new unsolvable grid
+            print("\n===== UNSOLVABLE SUDOKU DETECTED =====")
+            print_grid(grid, "Detected Unsolvable Grid")
+            last_grid_hash = grid_hash
             
-            if grid_hash != last_grid_hash:  # Only print if it's a new unsolvable grid
-                print("\n===== UNSOLVABLE SUDOKU DETECTED =====")
-                print_grid(grid, "Detected Unsolvable Grid")
-                last_grid_hash = grid_hash
-                
-            return image
+        return image
+
+    if still_solving:
+        # The overlay is the last known solution, the one of this exact grid is on its way
+        cv2.putText(image, "Solving...", (20, image.shape[0] - 80), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2, cv2.LINE_AA)
 
     # If this is a new grid and we successfully solved it, print to terminal
-    if grid_hash != last_grid_hash and was_solved:
+    if grid_hash != last_grid_hash and was_solved and not still_solving:
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         print("\n" + "="*50)
         print(f"SUDOKU DETECTED AND SOLVED | {timestamp}")
@@ -499,8 +860,5 @@ def recognize_and_solve_sudoku(image, model, old_sudoku):
         # Update the last grid hash
         last_grid_hash = grid_hash
 
-    # Apply inverse perspective transform and paste the solutions on top of the orginal image
-    result_sudoku = cv2.warpPerspective(orginal_warp, perspective_transformed_matrix, (image.shape[1], image.shape[0]), flags=cv2.WARP_INVERSE_MAP)
-    result = np.where(result_sudoku.sum(axis=-1,keepdims=True)!=0, result_sudoku, image)
-
-    return result
\ No newline at end of file
+    # Paste the solutions on top of the orginal image
+    return paste_warp_on_image(image, orginal_warp, perspective_transformed_matrix)
\ No newline at end of file
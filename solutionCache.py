@@ -0,0 +1,165 @@
+# This .py file keeps the results of solved puzzles, so a board seen before doesn't have to be solved again
+#
+# Results are keyed by the 81 digit puzzle string (0 for empty cells).
+# The most recently used results are kept in memory (LRU). If a file is given, definitive
+# results (not timeouts) are also stored in an sqlite database, so they survive restarts.
+#
+# With canonical=True the key is the canonical grid of sudokuSymmetry instead, so puzzles that
+# are rotated, transposed, band/stack permuted or digit relabelled versions of a cached puzzle
+# are answered by transforming the cached solution back.
+#
+# The difficulty grade of a board is kept next to its solution, so the live pipeline grades a
+# board only once. Grades are keyed by the exact puzzle string even with canonical=True, since
+# the layout part of the grade changes under the symmetries.
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import sudokuSolver
+import sudokuSymmetry
+
+class SolutionCache:
+    def __init__(self, max_entries=256, path=None, canonical=False):
+        self.max_entries = max_entries
+        self.canonical = canonical
+        self.entries = OrderedDict()    # Puzzle string -> SolveResult, least recently used first
+        self.canonical_keys = OrderedDict()     # Puzzle string -> (canonical string, transform)
+        self.lock = threading.Lock()    # The cache is shared by the frame loop and the solver thread
+        self.hits = 0                   # Found in memory
+        self.disk_hits = 0              # Found in the database
+        self.misses = 0
+        self.difficulties = OrderedDict()   # Puzzle string -> (difficulty level, score), least recently used first
+        self.difficulty_hits = 0
+        self.difficulty_misses = 0
+
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                            "(puzzle TEXT PRIMARY KEY, status TEXT, solution_count INTEGER, solution TEXT)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS difficulties "
+                            "(puzzle TEXT PRIMARY KEY, level TEXT, score REAL)")
+            self.db.commit()
+
+    # Return the cached SolveResult of a grid, None if it has never been solved
+    def get(self, grid):
+        key, transform = self.key_for(grid)
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                result = self.load(key)
+                if result is None:
+                    self.misses += 1
+                    return None
+                self.disk_hits += 1
+                self.remember(key, result)
+
+        if transform is not None and result.solution is not None:
+            result = result._replace(solution=sudokuSymmetry.undo_transform(result.solution, transform))
+        return result
+
+    # Store the SolveResult of a grid
+    def put(self, grid, result):
+        key, transform = self.key_for(grid)
+        if transform is not None and result.solution is not None:
+            result = result._replace(solution=sudokuSymmetry.apply_transform(result.solution, transform))
+        with self.lock:
+            self.remember(key, result)
+            if self.db is not None and result.status != "timeout":
+                solution = sudokuSolver.grid_to_string(result.solution) if result.solution is not None else None
+                self.db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+                                (key, result.status, result.solution_count, solution))
+                self.db.commit()
+
+    # Fraction of lookups answered from memory or disk
+    def hit_rate(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+    # Return the cached (difficulty level, score) of a grid, None if it has never been graded
+    def get_difficulty(self, grid):
+        key = sudokuSolver.grid_to_string(grid)
+        with self.lock:
+            graded = self.difficulties.get(key)
+            if graded is None and self.db is not None:
+                graded = self.db.execute("SELECT level, score FROM difficulties WHERE puzzle = ?", (key,)).fetchone()
+            if graded is None:
+                self.difficulty_misses += 1
+                return None
+            self.difficulty_hits += 1
+            self.remember_difficulty(key, tuple(graded))
+            return tuple(graded)
+
+    # Store the (difficulty level, score) of a grid
+    def put_difficulty(self, grid, graded):
+        key = sudokuSolver.grid_to_string(grid)
+        with self.lock:
+            self.remember_difficulty(key, graded)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO difficulties VALUES (?, ?, ?)", (key, graded[0], graded[1]))
+                self.db.commit()
+
+    # Fraction of difficulty lookups answered from memory or disk
+    def difficulty_hit_rate(self):
+        lookups = self.difficulty_hits + self.difficulty_misses
+        return self.difficulty_hits / lookups if lookups else 0.0
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, grid):
+        key, _ = self.key_for(grid)
+        with self.lock:
+            return key in self.entries
+
+    # Return the cache key of a grid and the transform to its canonical grid (None if not canonical)
+    def key_for(self, grid):
+        key = sudokuSolver.grid_to_string(grid)
+        if not self.canonical:
+            return key, None
+        with self.lock:
+            known = self.canonical_keys.get(key)
+        if known is None:
+            canonical_grid, transform = sudokuSymmetry.canonicalize(grid)
+            known = (sudokuSolver.grid_to_string(canonical_grid), transform)
+            with self.lock:
+                self.canonical_keys[key] = known
+                if len(self.canonical_keys) > self.max_entries:
+                    self.canonical_keys.popitem(last=False)
+        return known
+
+    # Put a result in memory, dropping the least recently used one when full (lock held)
+    def remember(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    # Put a grade in memory, dropping the least recently used one when full (lock held)
+    def remember_difficulty(self, key, graded):
+        self.difficulties[key] = graded
+        self.difficulties.move_to_end(key)
+        if len(self.difficulties) > self.max_entries:
+            self.difficulties.popitem(last=False)
+
+    # Read a result from the database (lock held)
+    def load(self, key):
+        if self.db is None:
+            return None
+        row = self.db.execute("SELECT status, solution_count, solution FROM solutions WHERE puzzle = ?",
+                              (key,)).fetchone()
+        if row is None:
+            return None
+        status, solution_count, solution = row
+        solution = sudokuSolver.grid_from_string(solution) if solution is not None else None
+        return sudokuSolver.SolveResult(status, solution_count, solution, None)
@@ -0,0 +1,51 @@
+# This .py file limits how much work the solver engines are allowed to do
+#
+# The engines call tick() once per search node. A budget can limit the number of nodes,
+# the time spent, and can be cancelled from another thread through a cancel token
+# (any object with an is_set() method, e.g. threading.Event).
+# Looking at the clock or the token on every node would slow the search down,
+# so those are only checked every CHECK_INTERVAL nodes.
+
+import time
+
+CHECK_INTERVAL = 256
+
+# How often each kind of budget ran out (in this process), by reason
+budget_counters = {"time": 0, "nodes": 0, "cancelled": 0}
+
+# Raised by the solver engines when a solve runs out of budget
+# reason is "time", "nodes" or "cancelled"
+class SolveBudgetExceeded(Exception):
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+class SolveBudget:
+    def __init__(self, time_limit=None, max_nodes=None, cancel_token=None):
+        self.time_limit = time_limit        # In seconds, None for no limit
+        self.max_nodes = max_nodes          # None for no limit
+        self.cancel_token = cancel_token    # None if the solve can't be cancelled
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.nodes = 0
+
+    # Count one search node, raise SolveBudgetExceeded once the budget is used up
+    def tick(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            self.exceeded("nodes", f"Solve gave up after {self.max_nodes} nodes")
+        if self.nodes % CHECK_INTERVAL != 0:
+            return
+        if self.cancel_token is not None and self.cancel_token.is_set():
+            self.exceeded("cancelled", f"Solve cancelled after {self.nodes} nodes")
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.exceeded("time", f"Solve timed out after {self.time_limit} s ({self.nodes} nodes)")
+
+    def exceeded(self, reason, message):
+        budget_counters[reason] += 1
+        raise SolveBudgetExceeded(reason, message)
+
+# Build the budget for a solve, None if there is nothing to limit
+def make_budget(time_limit=None, max_nodes=None, cancel_token=None):
+    if time_limit is None and max_nodes is None and cancel_token is None:
+        return None
+    return SolveBudget(time_limit, max_nodes, cancel_token)
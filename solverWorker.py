@@ -0,0 +1,82 @@
+# This .py file runs the solver on a background thread, so the video loop never waits for a solve
+#
+# The frame loop submits every recognized grid and asks for its result on every frame.
+# The worker solves the latest submitted grid off the render thread and publishes the
+# result in a solutionCache.SolutionCache keyed by the grid, while the frame loop keeps rendering.
+
+import threading
+
+import sudokuSolver
+from solutionCache import SolutionCache
+
+class SolverWorker:
+    # Keep the results of this many grids when no cache is given, the oldest ones are dropped first
+    MAX_RESULTS = 64
+
+    def __init__(self, time_limit=5.0, max_nodes=None, cache=None):
+        self.time_limit = time_limit    # Budget of one solve, generous since nobody is waiting for it
+        self.max_nodes = max_nodes
+        self.results = cache if cache is not None else SolutionCache(self.MAX_RESULTS)
+        self.pending = None             # Latest submitted grid, waiting to be solved
+        self.solving = None             # Grid string being solved right now
+        self.last_solution = None       # Most recently solved grid
+        self.gave_up = set()            # Grid strings this worker ran out of time on, not tried again
+        self.condition = threading.Condition()
+        self.cancel_token = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="SolverWorker", daemon=True)
+        self.thread.start()
+
+    # Ask for a grid to be solved. Only the latest submitted grid is kept waiting,
+    # older grids that haven't been picked up yet are dropped (the board moved on)
+    # candidates is the CandidateGrid of the grid, if the caller already has it
+    # A cached timeout isn't an answer (it may come from a smaller budget than this worker's),
+    # the grid is solved again unless this worker already ran out of time on it
+    def submit(self, grid, candidates=None):
+        key = sudokuSolver.grid_to_string(grid)
+        with self.condition:
+            if key == self.solving or key in self.gave_up:
+                return
+            if grid in self.results and self.results.get(grid).status != "timeout":
+                return
+            self.pending = (key, [row[:] for row in grid], candidates)
+            self.condition.notify()
+
+    # True if a grid has been submitted and is still waiting or being solved
+    def is_waiting(self, grid):
+        key = sudokuSolver.grid_to_string(grid)
+        with self.condition:
+            return key == self.solving or (self.pending is not None and self.pending[0] == key)
+
+    # Return the SolveResult of a grid, or None if it hasn't been solved (yet)
+    def get(self, grid):
+        return self.results.get(grid)
+
+    # Stop the worker, cancelling the solve in progress
+    def stop(self):
+        self.cancel_token.set()
+        with self.condition:
+            self.condition.notify()
+        self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.cancel_token.is_set():
+                    self.condition.wait()
+                if self.cancel_token.is_set():
+                    return
+                key, grid, candidates = self.pending
+                self.pending = None
+                self.solving = key
+
+            result = sudokuSolver.solve_grid(grid, self.time_limit, self.max_nodes, self.cancel_token, candidates)
+
+            with self.condition:
+                self.solving = None
+                if result.reason == "cancelled":
+                    return
+                self.results.put(grid, result)
+                if result.status == "timeout":
+                    self.gave_up.add(key)
+                if result.status == "solved":
+                    self.last_solution = result.solution
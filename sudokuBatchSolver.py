@@ -0,0 +1,128 @@
+# This .py file solves many Sudoku puzzles at once with NumPy
+#
+# All puzzles of the batch go through constraint propagation together:
+# the candidates of every cell are kept as 9-bit masks in one (N, 81) array and
+# naked singles (a cell with one candidate) and hidden singles (a digit with one possible
+# cell in a row, column or block) are filled in for the whole batch with array operations.
+# Most puzzles are solved by propagation alone, only the residual hard puzzles
+# fall back to the per-puzzle search of sudokuSolver.solve_sudoku.
+
+import numpy as np
+
+import sudokuSolver
+from candidateGrid import ALL_DIGITS, BIT_COUNT
+
+# Status of each puzzle returned by solve_sudoku_batch
+SOLVED = 0
+NO_SOLUTION = 1     # Propagation or search proved there is no solution
+INVALID = 2         # The given digits already break the rules
+NEEDS_SEARCH = 3    # Only used internally: propagation got stuck, the puzzle goes to the search
+
+# Cell indices (row * 9 + col) of the 27 units: 9 rows, 9 columns, 9 blocks
+UNITS = np.array(
+    [[i * 9 + j for j in range(9)] for i in range(9)] +
+    [[i * 9 + j for i in range(9)] for j in range(9)] +
+    [[(b // 3 * 3 + k // 3) * 9 + b % 3 * 3 + k % 3 for k in range(9)] for b in range(9)])
+
+# The 3 units (row, column, block) every cell belongs to
+CELL_UNITS = np.array([[i, 9 + j, 18 + (i // 3) * 3 + j // 3] for i in range(9) for j in range(9)])
+
+# Number of candidates of every 9-bit mask, and the digit of every single-bit mask
+POPCOUNT = np.array(BIT_COUNT, dtype=np.uint8)
+SINGLE_DIGIT = np.array([mask.bit_length() for mask in range(ALL_DIGITS + 1)], dtype=np.uint8)
+
+DIGIT_BITS = (1 << np.arange(9)).astype(np.uint16)
+
+# Solve an (N, 9, 9) array of puzzles (0 for empty cells)
+# Return an (N, 9, 9) uint8 array of solutions and an (N,) uint8 array of statuses
+# (SOLVED / NO_SOLUTION / INVALID). Puzzles that could not be solved keep their given digits.
+# Puzzles are propagated chunk_size at a time to bound the memory used.
+def solve_sudoku_batch(puzzles, engine=None, chunk_size=10000):
+    puzzles = np.asarray(puzzles, dtype=np.uint8)
+    if puzzles.ndim != 3 or puzzles.shape[1:] != (9, 9):
+        raise ValueError(f"Expected an (N, 9, 9) array of puzzles, got shape {puzzles.shape}")
+
+    values = puzzles.reshape(-1, 81).copy()
+    status = np.full(len(values), NO_SOLUTION, dtype=np.uint8)
+
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        status[start:start + chunk_size] = propagate(chunk)
+
+    # Residual puzzles: propagation got stuck without a contradiction, search them one by one
+    for n in np.nonzero(status == NEEDS_SEARCH)[0]:
+        matrix = values[n].reshape(9, 9).tolist()
+        if sudokuSolver.solve_sudoku(matrix, engine):
+            values[n] = np.array(matrix, dtype=np.uint8).reshape(81)
+            status[n] = SOLVED
+        else:
+            status[n] = NO_SOLUTION
+
+    # Don't hand out half propagated grids for the puzzles without a solution
+    unsolved = status != SOLVED
+    values[unsolved] = puzzles.reshape(-1, 81)[unsolved]
+    return values.reshape(-1, 9, 9), status
+
+# Bitmask of the digits already used in every unit, (N, 27)
+def unit_masks(values):
+    bits = np.where(values > 0, np.left_shift(1, values.astype(np.int32) - 1), 0).astype(np.uint16)
+    return np.bitwise_or.reduce(bits[:, UNITS], axis=2)
+
+# Candidates of every cell as 9-bit masks, 0 for the filled cells, (N, 81)
+def candidate_masks(values):
+    used = np.bitwise_or.reduce(unit_masks(values)[:, CELL_UNITS], axis=2)
+    return np.where(values == 0, ALL_DIGITS & ~used, 0).astype(np.uint16)
+
+# Number of times every digit appears in every unit, (N, 27, 9)
+def digit_counts(values):
+    n, cell = np.nonzero(values)
+    digit = values[n, cell].astype(np.intp) - 1
+    slots = (n[:, None] * 27 + CELL_UNITS[cell]) * 9 + digit[:, None]    # Every digit counts in 3 units
+    return np.bincount(slots.ravel(), minlength=len(values) * 243).reshape(-1, 27, 9)
+
+# Fill in naked and hidden singles in place until nothing changes anymore
+# Return the status of every puzzle: SOLVED if it got filled, INVALID if the given digits
+# clash, NO_SOLUTION on a contradiction and NEEDS_SEARCH if it still has empty cells
+def propagate(values):
+    status = np.full(len(values), NEEDS_SEARCH, dtype=np.uint8)
+    invalid = (digit_counts(values) > 1).any(axis=(1, 2))
+    status[invalid] = INVALID
+
+    active = np.nonzero(~invalid)[0]
+    while len(active):
+        grids = values[active]
+        candidates = candidate_masks(grids)
+        empty = grids == 0
+
+        # Contradictions: an empty cell without candidates, a digit used twice in a unit
+        # (two singles placed on the same round can clash) or a missing digit without a place
+        unit_bits = (candidates[:, UNITS, None] & DIGIT_BITS) != 0      # (n, 27, 9 cells, 9 digits)
+        places = unit_bits.sum(axis=2, dtype=np.uint8)                     # (n, 27, 9)
+        counts = digit_counts(grids)
+        dead = ((empty & (candidates == 0)).any(axis=1) |
+                (counts > 1).any(axis=(1, 2)) |
+                ((counts == 0) & (places == 0)).any(axis=(1, 2)))
+
+        # Naked singles
+        naked = empty & (POPCOUNT[candidates] == 1)
+        grids = np.where(naked, SINGLE_DIGIT[candidates], grids)
+
+        # Hidden singles: the only place of a digit in a unit
+        hidden = (places == 1) & (counts == 0)
+        n_idx, u_idx, d_idx = np.nonzero(hidden)
+        position = unit_bits[n_idx, u_idx, :, d_idx].argmax(axis=1)
+        cells = UNITS[u_idx, position]
+        grids[n_idx, cells] = d_idx + 1
+
+        changed = (naked.any(axis=1) | hidden.any(axis=(1, 2))) & ~dead
+        values[active] = np.where(dead[:, None], values[active], grids)
+
+        done = ~(values[active] == 0).any(axis=1) & ~dead
+        status[active[dead]] = NO_SOLUTION
+        status[active[done]] = SOLVED
+        active = active[changed & ~done]
+
+    # A filled grid is only solved if it doesn't break the rules
+    filled = status == SOLVED
+    status[filled & (digit_counts(values) > 1).any(axis=(1, 2))] = NO_SOLUTION
+    return status
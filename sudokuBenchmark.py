@@ -0,0 +1,213 @@
+# Benchmarks for the performance critical parts of Snap-n-Solve
+#
+# Usage:
+#   python sudokuBenchmark.py recognition [--video screenshots/demo.mp4] [--frames 60]
+#   python sudokuBenchmark.py solvers [--puzzles FILE] [--engines bitmask dlx best_first]
+#   python sudokuBenchmark.py distances [--sizes 200 300 450 600 700]
+#   python sudokuBenchmark.py quads [--angles 0 10 20 30]
+
+import argparse
+import contextlib
+import io
+import time
+
+import cv2
+import numpy as np
+
+import sudokuSolver
+
+# Well known hard puzzles (Inkala, Norvig, 17-clue puzzles, ...), used when no puzzle file is given
+HARD_PUZZLES = [
+    "800000000003600000070090200050007000000045700000100030001000068008500010090000400",
+    "850002400720000009004000000000107002305000900040000000000080070017000000000036040",
+    "400000805030000000000700000020000060000080400000010000000603070500200000104000000",
+    "005300000800000020070010500400005300010070006003200080060500009004000030000009700",
+    "100007090030020008009600500005300900010080002600004000300000010040000007007000300",
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+    "120400300300010050006000100700090000040603000003002000500080700007000005000000098",
+    "000000039000001005003050800008090006070002000100400000009080050020000600400700000",
+]
+
+# Wrap a model so that predict() classifies one image per call,
+# the way the recognizer worked before the cells were batched
+class PerCellModel:
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, digit_batch, verbose=0):
+        predictions = [self.model.predict(digit_batch[k:k+1], verbose=verbose) for k in range(len(digit_batch))]
+        if not predictions:
+            return np.zeros((0, 9), dtype="float32")
+        return np.concatenate(predictions)
+
+# Read up to max_frames frames from a recorded video
+def read_frames(video_path, max_frames):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+# Run the whole per-frame pipeline on every frame and return the latencies in milliseconds
+def time_frames(frames, model, repeat=1):
+    import realTimeSudokuSolver  # Pulls in TensorFlow, only needed for recognition benchmarks
+    latencies = []
+    # The pipeline prints every new grid to the terminal, keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            # Every pass starts without the repairs and solves of an earlier pass
+            realTimeSudokuSolver.remembered_repairs.clear()
+            realTimeSudokuSolver.timed_out_repairs.clear()
+            realTimeSudokuSolver.last_solve = None
+            for frame in frames:
+                realTimeSudokuSolver.last_grid_hash = None
+                start = time.perf_counter()
+                realTimeSudokuSolver.recognize_and_solve_sudoku(np.copy(frame), model, None)
+                latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def print_latencies(name, latencies):
+    print(f"{name:<12} mean {latencies.mean():8.2f} ms | median {np.median(latencies):8.2f} ms | "
+          f"p95 {np.percentile(latencies, 95):8.2f} ms | {1000 / latencies.mean():6.1f} FPS")
+
+def benchmark_recognition(args):
+    from main import model  # Loading the model is slow, only do it when needed
+    if model is None:
+        print("ERROR: Neural network model could not be loaded.")
+        return
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        print(f"ERROR: Could not read any frame from {args.video}")
+        return
+    print(f"Benchmarking frame latency on {len(frames)} frames of {args.video}")
+
+    time_frames(frames[:1], model)  # Warm up the model
+    print_latencies("per-cell", time_frames(frames, PerCellModel(model), args.repeat))
+    print_latencies("batched", time_frames(frames, model, args.repeat))
+
+# Draw a printed Sudoku board of size x size pixels with the digits of puzzle (81 characters)
+# on a gray 1280x720 frame. Return the frame and the 4 corners of the board
+def synthetic_frame(puzzle, size):
+    frame = np.full((720, 1280, 3), 120, dtype=np.uint8)
+    top, left = (720 - size) // 2, (1280 - size) // 2
+    cell = size / 9
+    board = frame[top:top + size, left:left + size]
+    board[:] = 255
+    for k in range(10):
+        position = min(int(round(k * cell)), size - 1)
+        thickness = 4 if k % 3 == 0 else 1
+        cv2.line(board, (position, 0), (position, size - 1), (0, 0, 0), thickness)
+        cv2.line(board, (0, position), (size - 1, position), (0, 0, 0), thickness)
+    for k, digit in enumerate(puzzle):
+        if digit not in "0.":
+            i, j = divmod(k, 9)
+            corner = (int(j * cell + cell / 4), int(i * cell + 3 * cell / 4))
+            cv2.putText(board, digit, corner, cv2.FONT_HERSHEY_SIMPLEX, cell / 40, (0, 0, 0), 2)
+    rect = np.array([[left, top], [left + size - 1, top], [left + size - 1, top + size - 1],
+                     [left, top + size - 1]], dtype="float32")
+    return frame, rect
+
+# Time the recognition warp and the cell extraction of boards at several distances from the camera,
+# with the warp at the size of the board in the frame and at the constant RECOGNITION_SIZE
+def benchmark_distances(args):
+    import realTimeSudokuSolver  # Pulls in TensorFlow, only needed for recognition benchmarks
+    puzzle = HARD_PUZZLES[0]
+    clues = sum(digit not in "0." for digit in puzzle)
+    print(f"Recognition warp + cell extraction, {args.repeat} runs per board size ({clues} digits on the board)")
+    for size in args.sizes:
+        frame, rect = synthetic_frame(puzzle, size)
+        for name, warp_size in (("board-sized", None), ("canonical", realTimeSudokuSolver.RECOGNITION_SIZE)):
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                warp = realTimeSudokuSolver.recognition_warp(frame, rect, warp_size)
+                digit_batch, _ = realTimeSudokuSolver.extract_digit_cells(warp)
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies = np.array(latencies)
+            print(f"board {size:4d} px {name:<12} mean {latencies.mean():7.3f} ms | "
+                  f"median {np.median(latencies):7.3f} ms | {len(digit_batch)} digits found")
+
+# Time the quadrilateral fit of board contours, with the stepping loop and with fit_quadrilateral
+def benchmark_quads(args):
+    import realTimeSudokuSolver  # Pulls in TensorFlow, only needed for recognition benchmarks
+    print(f"Quadrilateral fit of the board contour, {args.repeat} runs per angle")
+    for angle in args.angles:
+        frame, _ = synthetic_frame(HARD_PUZZLES[0], 450)
+        rotation = cv2.getRotationMatrix2D((frame.shape[1] / 2, frame.shape[0] / 2), angle, 1.0)
+        frame = cv2.warpAffine(frame, rotation, (frame.shape[1], frame.shape[0]), borderValue=(120, 120, 120))
+        contour = realTimeSudokuSolver.find_board_contour(frame)
+
+        fits = {}
+        for name, fit in (("stepping", lambda: realTimeSudokuSolver.get_corners_from_contours(contour, 4)),
+                          ("bisection", lambda: realTimeSudokuSolver.fit_quadrilateral(contour)[0])):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                corners = fit()
+            fits[name] = corners
+            print(f"angle {angle:3d} {name:<10} {(time.perf_counter() - start) / args.repeat * 1e6:8.1f} us")
+
+        corners, score = realTimeSudokuSolver.fit_quadrilateral(contour)
+        if fits["stepping"] is None or corners is None:
+            print("          no quadrilateral found")
+            continue
+        stepping = realTimeSudokuSolver.order_corners(fits["stepping"])
+        print(f"          corners differ by {np.abs(stepping - corners).max():.1f} px, fit quality {score:.3f}")
+
+# Read puzzles from a file, one 81 character puzzle per line
+def read_puzzles(path):
+    with open(path) as puzzle_file:
+        return [line.strip() for line in puzzle_file if len(line.strip()) == 81]
+
+def benchmark_solvers(args):
+    puzzles = read_puzzles(args.puzzles) if args.puzzles else HARD_PUZZLES
+    print(f"Benchmarking {len(args.engines)} engines on {len(puzzles)} puzzles")
+
+    for engine in args.engines:
+        latencies = []
+        solved = 0
+        for puzzle in puzzles:
+            matrix = sudokuSolver.grid_from_string(puzzle)
+            start = time.perf_counter()
+            solved += sudokuSolver.solve_sudoku(matrix, engine)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies = np.array(latencies)
+        print(f"{engine:<12} solved {solved}/{len(puzzles)} | total {latencies.sum():9.1f} ms | "
+              f"mean {latencies.mean():8.2f} ms | max {latencies.max():8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Snap-n-Solve benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    recognition = subparsers.add_parser("recognition", help="Frame latency with per-cell vs batched digit recognition")
+    recognition.add_argument("--video", default="screenshots/demo.mp4", help="Recorded video of a Sudoku board")
+    recognition.add_argument("--frames", type=int, default=60, help="Number of frames to use")
+    recognition.add_argument("--repeat", type=int, default=1, help="Number of passes over the frames")
+    recognition.set_defaults(func=benchmark_recognition)
+
+    solvers = subparsers.add_parser("solvers", help="Solve time of the solver engines on hard puzzles")
+    solvers.add_argument("--puzzles", help="File with one 81 character puzzle per line (default: built-in hard puzzles)")
+    solvers.add_argument("--engines", nargs="+", default=list(sudokuSolver.ENGINES),
+                         choices=list(sudokuSolver.ENGINES), help="Solver engines to compare")
+    solvers.set_defaults(func=benchmark_solvers)
+
+    distances = subparsers.add_parser("distances", help="Recognition cost of boards at several distances from the camera")
+    distances.add_argument("--sizes", type=int, nargs="+", default=[200, 300, 450, 600, 700],
+                           help="Sides of the board in the 1280x720 frame, in pixels")
+    distances.add_argument("--repeat", type=int, default=50, help="Number of runs per board size")
+    distances.set_defaults(func=benchmark_distances)
+
+    quads = subparsers.add_parser("quads", help="Quadrilateral fit of the board contour, stepping loop vs bisection")
+    quads.add_argument("--angles", type=int, nargs="+", default=[0, 10, 20, 30], help="Rotations of the board in degrees")
+    quads.add_argument("--repeat", type=int, default=200, help="Number of fits per angle")
+    quads.set_defaults(func=benchmark_quads)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
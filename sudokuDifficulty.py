@@ -1,9 +1,18 @@
+from collections import namedtuple
+
 import numpy as np
+import logicalSolver
+import sudokuSolver
+from candidateGrid import CandidateGrid
 
-def calculate_difficulty(grid):
+def calculate_difficulty(grid, solution_count=None, candidates=None):
     """
     Analyzes a Sudoku grid to determine its difficulty level.
     Returns a tuple: (difficulty_level, score)
+
+    solution_count is the number of solutions (as returned by
+    sudokuSolver.count_solutions with limit 2). It is counted here if not given.
+    candidates is the CandidateGrid of the grid, computed here if not given.
     
     Difficulty is based on several factors:
     1. Number of empty cells (more cells = harder)
@@ -15,245 +24,323 @@ def calculate_difficulty(grid):
     - Medium: Score 40-60
     - Hard: Score 60-80
     - Expert: Score > 80
+
+    Grids that are not proper puzzles get their own level:
+    - Unsolvable: No solution
+    - Non-unique: More than one solution
     """
+    if candidates is None:
+        candidates = CandidateGrid(grid)
+    if solution_count is None:
+        solution_count = count_solutions(grid, candidates=candidates)
+
     grid_array = np.array(grid)
     
     # Count empty cells (0s) - optimized with numpy
     empty_cells = np.count_nonzero(grid_array == 0)
     
     # Symmetry check
-    symmetry_score = check_symmetry(grid)
+    symmetry_score = check_symmetry(grid_array)
     
     # Calculate "isolation factor" - how spread out are the given numbers
-    isolation_factor = calculate_isolation(grid)
+    isolation_factor = calculate_isolation(grid_array)
     
     # Calculate "regional density" - are there regions with very few clues?
-    regional_density = calculate_regional_density(grid)
+    regional_density = calculate_regional_density(grid_array)
     
     # Calculate solving technique score
-    technique_score = estimate_solving_techniques(grid)
+    technique_score = estimate_solving_techniques(grid, candidates)
     
     # Calculate final score (0-100 scale)
-    # Weight the factors accordingly
-    final_score = (
-        min(empty_cells * 1.5, 45) +  # Max 45 points from empty cells
-        technique_score * 0.35 +      # Max 35 points from techniques
-        (10 - symmetry_score) * 0.1 + # Max 10 points from asymmetry
-        isolation_factor * 0.05 +     # Max 5 points from isolation
-        regional_density * 0.05       # Max 5 points from regional sparsity
-    )
+    final_score = float(combine_scores(empty_cells, technique_score, symmetry_score,
+                                       isolation_factor, regional_density))
     
-    # Determine difficulty level based on final score
-    if final_score < 40:
-        return "Easy", final_score
+    return difficulty_level(final_score, solution_count), final_score
+
+def calculate_difficulty_batch(grids, solution_counts=None, time_limit=None, details=False):
+    """
+    Batch version of calculate_difficulty for an (N, 9, 9) array of grids.
+    Returns a tuple: (difficulty_levels, scores), a list of N labels and an
+    array of N scores, equal to calling calculate_difficulty on every grid.
+
+    The layout metrics are computed for all grids at once, the solving
+    techniques and (if solution_counts is not given) the solution counts
+    still need one solve per grid.
+
+    time_limit is the budget for counting the solutions of every single grid
+    in seconds. A grid that runs out of it gets the level "Timeout" and a
+    solution count of None.
+    With details, a third element is returned: a dict with the parts of the
+    scores, the arrays of difficulty_metrics_batch plus the lists
+    solution_count, technique_score and hardest_technique.
+    """
+    grids = np.asarray(grids)
+    boards = [grid.tolist() for grid in grids]
+    candidates = [CandidateGrid(board) for board in boards]
+    if solution_counts is None:
+        solution_counts = []
+        for board, c in zip(boards, candidates):
+            try:
+                solution_counts.append(count_solutions(board, candidates=c, time_limit=time_limit))
+            except sudokuSolver.SolveBudgetExceeded:
+                solution_counts.append(None)
+
+    techniques = [logicalSolver.grade_techniques(board, c) for board, c in zip(boards, candidates)]
+    technique_scores = np.array([score for score, _, _ in techniques])
+    metrics = difficulty_metrics_batch(grids)
+    scores = combine_scores(metrics["empty_cells"], technique_scores, metrics["symmetry"],
+                            metrics["isolation"], metrics["regional_density"])
+    levels = ["Timeout" if count is None else difficulty_level(score, count)
+              for score, count in zip(scores, solution_counts)]
+    if not details:
+        return levels, scores
+
+    metrics["solution_count"] = list(solution_counts)
+    metrics["technique_score"] = [score for score, _, _ in techniques]
+    metrics["hardest_technique"] = [hardest for _, _, hardest in techniques]
+    return levels, scores, metrics
+
+def difficulty_metrics_batch(grids):
+    """
+    Computes the layout metrics of an (N, 9, 9) array of grids at once.
+    Returns a dict of arrays of length N: empty_cells, symmetry, isolation
+    and regional_density.
+    """
+    grids = np.asarray(grids)
+    return {
+        "empty_cells": np.count_nonzero(grids.reshape(len(grids), 81) == 0, axis=1),
+        "symmetry": check_symmetry_batch(grids),
+        "isolation": calculate_isolation_batch(grids),
+        "regional_density": calculate_regional_density_batch(grids),
+    }
+
+def combine_scores(empty_cells, technique_score, symmetry_score, isolation_factor, regional_density):
+    """
+    Weights the difficulty factors into the final 0-100 score.
+    Works on single values as well as on arrays of values.
+    """
+    return (
+        np.minimum(empty_cells * 1.5, 45) +  # Max 45 points from empty cells
+        technique_score * 0.35 +             # Max 35 points from techniques
+        (10 - symmetry_score) * 0.1 +        # Max 10 points from asymmetry
+        isolation_factor * 0.05 +            # Max 5 points from isolation
+        regional_density * 0.05              # Max 5 points from regional sparsity
+    )
+
+def difficulty_level(final_score, solution_count):
+    """
+    Returns the difficulty level of a score, see calculate_difficulty.
+    """
+    if solution_count == 0:
+        return "Unsolvable"
+    elif solution_count > 1:
+        return "Non-unique"
+    elif final_score < 40:
+        return "Easy"
     elif final_score < 60:
-        return "Medium", final_score
+        return "Medium"
     elif final_score < 80:
-        return "Hard", final_score
+        return "Hard"
     else:
-        return "Expert", final_score
+        return "Expert"
+
+def count_solutions(grid, limit=2, candidates=None, time_limit=None):
+    """
+    Counts the solutions of the grid, stopping at limit.
+    Returns 0 (no solution), 1 (unique) or limit (at least that many).
+    Raises sudokuSolver.SolveBudgetExceeded if it takes more than time_limit seconds.
+    """
+    test_grid = [row[:] for row in grid]  # The solver works on its own copy
+    return sudokuSolver.count_solutions(test_grid, limit, time_limit=time_limit, candidates=candidates)
 
 def check_symmetry(grid):
     """
     Checks how symmetrical the puzzle is.
     Returns a score from 0-10, where 10 is perfectly symmetrical.
     """
-    symmetry_count = 0
-    total_checks = 0
-    
-    for i in range(9):
-        for j in range(9):
-            # Check rotational symmetry (180 degrees)
-            opposite_i = 8 - i
-            opposite_j = 8 - j
-            
-            # Don't double count the center cell
-            if i == opposite_i and j == opposite_j:
-                continue
-                
-            total_checks += 1
-            # Both cells should either be filled or empty for symmetry
-            if (grid[i][j] == 0) == (grid[opposite_i][opposite_j] == 0):
-                symmetry_count += 1
-    
-    # Return score out of 10
-    return round(10 * symmetry_count / total_checks) if total_checks > 0 else 10
+    return int(check_symmetry_batch(np.asarray(grid)[np.newaxis])[0])
+
+def check_symmetry_batch(grids):
+    """
+    check_symmetry for an (N, 9, 9) array of grids, returns N scores.
+    """
+    filled = np.asarray(grids) != 0
+    # Rotational symmetry (180 degrees): both cells should either be filled or empty
+    matches = filled == filled[:, ::-1, ::-1]
+    # Don't count the center cell, it is its own opposite
+    symmetry_count = np.count_nonzero(matches.reshape(len(filled), 81), axis=1) - 1
+    return np.round(10 * symmetry_count / 80).astype(int)
+
+# Distance |a - b| between every pair of row (or column) indices
+LINE_DISTANCES = np.abs(np.arange(9)[:, np.newaxis] - np.arange(9)[np.newaxis, :])
 
 def calculate_isolation(grid):
     """
     Calculates how isolated the given numbers are.
     Returns a score from 0-10, where 10 means highly isolated numbers.
     """
-    isolation_score = 0
-    filled_cells = []
-    
-    # Find all filled cells
-    for i in range(9):
-        for j in range(9):
-            if grid[i][j] != 0:
-                filled_cells.append((i, j))
-    
-    if not filled_cells:
-        return 0
-    
-    # Calculate average distance between filled cells
-    total_distance = 0
-    comparisons = 0
-    
-    for i, cell1 in enumerate(filled_cells):
-        for cell2 in filled_cells[i+1:]:
-            manhattan_distance = abs(cell1[0] - cell2[0]) + abs(cell1[1] - cell2[1])
-            total_distance += manhattan_distance
-            comparisons += 1
-    
-    if comparisons == 0:
-        return 0
-        
-    avg_distance = total_distance / comparisons
-    # Normalize to 0-10 scale (maximum Manhattan distance is 16)
-    return min(10, avg_distance * 10 / 8)
+    return float(calculate_isolation_batch(np.asarray(grid)[np.newaxis])[0])
+
+def calculate_isolation_batch(grids):
+    """
+    calculate_isolation for an (N, 9, 9) array of grids, returns N scores.
+
+    The average Manhattan distance between filled cells is computed from the
+    number of filled cells per row and per column: the row part of the
+    distance summed over all pairs is sum over rows a, b of
+    count[a] * count[b] * |a - b| / 2, and the same for the columns.
+    """
+    filled = (np.asarray(grids) != 0).astype(np.int64)
+    row_counts = filled.sum(axis=2)
+    col_counts = filled.sum(axis=1)
+    total_distance = (np.einsum("na,ab,nb->n", row_counts, LINE_DISTANCES, row_counts) +
+                      np.einsum("na,ab,nb->n", col_counts, LINE_DISTANCES, col_counts)) // 2
+
+    filled_count = row_counts.sum(axis=1)
+    comparisons = filled_count * (filled_count - 1) // 2
+    avg_distance = total_distance / np.maximum(comparisons, 1)
+    # Normalize to 0-10 scale (maximum Manhattan distance is 16), 0 without pairs of filled cells
+    return np.where(comparisons > 0, np.minimum(10, avg_distance * 10 / 8), 0)
 
 def calculate_regional_density(grid):
     """
     Calculates how sparse some regions are compared to others.
     Returns a score from 0-10, where 10 means high variation in regional density.
     """
+    return float(calculate_regional_density_batch(np.asarray(grid)[np.newaxis])[0])
+
+def calculate_regional_density_batch(grids):
+    """
+    calculate_regional_density for an (N, 9, 9) array of grids, returns N scores.
+    """
+    filled = np.asarray(grids) != 0
     # Count filled cells in each 3x3 box
-    box_counts = [0] * 9
-    
-    for i in range(9):
-        for j in range(9):
-            if grid[i][j] != 0:
-                box_index = (i // 3) * 3 + (j // 3)
-                box_counts[box_index] += 1
-    
-    # Calculate variance in box counts
-    avg_count = sum(box_counts) / 9
-    variance = sum((count - avg_count) ** 2 for count in box_counts) / 9
-    
-    # Normalize to 0-10 scale (maximum variance would be around 9)
-    return min(10, variance * 10 / 5)
+    box_counts = filled.reshape(len(filled), 3, 3, 3, 3).sum(axis=(2, 4))
+    # Variance in box counts, normalized to 0-10 scale (maximum variance would be around 9)
+    variance = box_counts.reshape(len(filled), 9).var(axis=1)
+    return np.minimum(10, variance * 10 / 5)
 
-def estimate_solving_techniques(grid):
+def estimate_solving_techniques(grid, candidates=None):
     """
-    Estimates the solving techniques required based on grid analysis.
+    Estimates the solving techniques required by solving the grid step by step
+    with human techniques (see logicalSolver).
     Returns a score from 0-100, where higher means more advanced techniques.
     """
-    # This is a simplified estimation - a full implementation would 
-    # actually try different solving techniques
-    
-    # Count naked singles (cells with only one possible value)
-    naked_singles = count_naked_singles(grid)
-    
-    # Fewer naked singles means harder puzzle
-    if naked_singles > 15:
-        return 10  # Very easy - mostly naked singles
-    elif naked_singles > 10:
-        return 30  # Easy - many naked singles
-    elif naked_singles > 5:
-        return 60  # Medium - some naked singles
-    else:
-        return 90  # Hard/Expert - very few naked singles
+    score, _, _ = logicalSolver.grade_techniques(grid, candidates)
+    return score
+
+def solving_techniques(grid, candidates=None):
+    """
+    Returns (technique_counts, hardest_technique): how often each human technique
+    was needed to solve the grid, and the hardest one ("trial_and_error" if the
+    techniques were not enough).
+    """
+    _, technique_counts, hardest = logicalSolver.grade_techniques(grid, candidates)
+    return technique_counts, hardest
 
-def count_naked_singles(grid):
+def count_naked_singles(grid, candidates=None):
     """
     Counts how many cells have only one possible value.
     """
-    count = 0
-    
-    for i in range(9):
-        for j in range(9):
-            if grid[i][j] == 0:  # Empty cell
-                possibilities = get_possibilities(grid, i, j)
-                if len(possibilities) == 1:
-                    count += 1
-                    
-    return count
+    if candidates is None:
+        candidates = CandidateGrid(grid)
+    return candidates.count_naked_singles()
 
-def get_possibilities(grid, row, col):
+def get_possibilities(grid, row, col, candidates=None):
     """
     Returns the possible values for a cell at (row, col).
     """
     if grid[row][col] != 0:
         return []
-        
-    possibilities = set(range(1, 10))
-    
-    # Check row
-    for c in range(9):
-        if grid[row][c] != 0:
-            possibilities.discard(grid[row][c])
-    
-    # Check column
-    for r in range(9):
-        if grid[r][col] != 0:
-            possibilities.discard(grid[r][col])
-    
-    # Check 3x3 box
-    box_row, box_col = (row // 3) * 3, (col // 3) * 3
-    for r in range(box_row, box_row + 3):
-        for c in range(box_col, box_col + 3):
-            if grid[r][c] != 0:
-                possibilities.discard(grid[r][c])
-    
-    return possibilities
+    if candidates is None:
+        candidates = CandidateGrid(grid)
+    return candidates.possibilities(row, col)
 
-def is_valid_sudoku(grid):
+def is_valid_sudoku(grid, candidates=None, conflicts=None):
     """
     Checks if a Sudoku grid is valid (no duplicates in rows, columns, or boxes).
     Returns (True, None) if valid or (False, error_message) if invalid.
+    candidates is the CandidateGrid of the grid and conflicts the result of
+    find_conflicts, both computed here if not given.
     """
-    # Check rows
-    for row in range(9):
-        values = {}
-        for col in range(9):
-            val = grid[row][col]
-            if val != 0:
-                if val in values:
-                    return False, f"Duplicate {val} in row {row+1}"
-                values[val] = True
-    
-    # Check columns
-    for col in range(9):
-        values = {}
-        for row in range(9):
-            val = grid[row][col]
-            if val != 0:
-                if val in values:
-                    return False, f"Duplicate {val} in column {col+1}"
-                values[val] = True
-    
-    # Check 3x3 boxes
-    for box_row in range(0, 9, 3):
-        for box_col in range(0, 9, 3):
-            values = {}
-            for row in range(box_row, box_row + 3):
-                for col in range(box_col, box_col + 3):
-                    val = grid[row][col]
-                    if val != 0:
-                        if val in values:
-                            return False, f"Duplicate {val} in 3x3 box at position ({box_row//3+1},{box_col//3+1})"
-                        values[val] = True
+    if conflicts is None:
+        conflicts = find_conflicts(grid)
+
+    # Report the first conflict: rows first, then columns, then 3x3 boxes
+    if conflicts:
+        conflict = conflicts[0]
+        if conflict.kind == "row":
+            return False, f"Duplicate {conflict.digit} in row {conflict.unit+1}"
+        if conflict.kind == "column":
+            return False, f"Duplicate {conflict.digit} in column {conflict.unit+1}"
+        return False, f"Duplicate {conflict.digit} in 3x3 box at position ({conflict.unit//3+1},{conflict.unit%3+1})"
     
     # Check if the puzzle has a solution
-    test_grid = [row[:] for row in grid]  # Make a deep copy
-    solution_exists = check_solution_exists(test_grid)
+    solution_exists = check_solution_exists(grid, candidates)
     if not solution_exists:
         return False, "Puzzle has no solution"
     
     return True, None
 
-def check_solution_exists(grid):
+# A digit repeated in a unit. kind is "row", "column" or "box", unit its index (0-8, boxes
+# row by row) and cells the (row, col) positions of all the copies of the digit in that unit
+Conflict = namedtuple("Conflict", ["kind", "unit", "digit", "cells"])
+
+DIGITS = np.arange(1, 10, dtype=np.uint8)
+
+def find_conflicts(grid):
+    """
+    Finds every digit that is repeated in a row, column or 3x3 box.
+    Returns a list of Conflict: rows first, then columns, then boxes, each
+    ordered by unit and by where the repeat shows up in the unit (the order
+    in which a cell-by-cell scan would run into them).
+    """
+    grid_array = np.asarray(grid, dtype=np.uint8)
+    # one_hot[i, j, d] is True if cell (i, j) holds digit d+1
+    one_hot = grid_array[:, :, np.newaxis] == DIGITS
+    # The same cells as (unit, position in unit, digit) for every kind of unit
+    units = (
+        ("row", one_hot),
+        ("column", one_hot.transpose(1, 0, 2)),
+        ("box", one_hot.reshape(3, 3, 3, 3, 9).transpose(0, 2, 1, 3, 4).reshape(9, 9, 9)),
+    )
+    counts = [cells.sum(axis=1) for _, cells in units]     # (unit, digit) for every kind
+    if max(count.max() for count in counts) <= 1:
+        return []
+
+    conflicts = []
+    for (kind, cells), count in zip(units, counts):
+        repeats = []
+        for unit, d in zip(*np.nonzero(count > 1)):
+            positions = np.nonzero(cells[unit, :, d])[0]
+            repeats.append((int(unit), int(positions[1]), int(d) + 1, positions))
+        # Order by unit, then by the position of the second copy
+        for unit, _, digit, positions in sorted(repeats, key=lambda r: (r[0], r[1])):
+            conflicts.append(Conflict(kind, unit, digit, [unit_cell(kind, unit, int(k)) for k in positions]))
+    return conflicts
+
+def unit_cell(kind, unit, position):
+    """
+    Returns the (row, col) of the cell at position (0-8) in a unit.
+    """
+    if kind == "row":
+        return unit, position
+    if kind == "column":
+        return position, unit
+    return unit // 3 * 3 + position // 3, unit % 3 * 3 + position % 3
+
+def conflict_cells(conflicts):
+    """
+    Returns the sorted (row, col) positions of all cells taking part in a conflict.
+    """
+    return sorted({cell for conflict in conflicts for cell in conflict.cells})
+
+def check_solution_exists(grid, candidates=None):
     """
     Quick check if a solution might exist by testing a few steps.
     Note: This is not a complete solver but a quicker validity check.
     """
-    # Check if any cell has no valid options
-    for i in range(9):
-        for j in range(9):
-            if grid[i][j] == 0:
-                possibilities = get_possibilities(grid, i, j)
-                if not possibilities:
-                    return False  # No options for this cell means no solution
-    
-    return True  # Passed the quick check - solution might exist
\ No newline at end of file
+    if candidates is None:
+        candidates = CandidateGrid(grid)
+    # Any cell without valid options means no solution
+    return not candidates.has_dead_cell()
@@ -0,0 +1,114 @@
+# This .py file grades the difficulty of puzzle datasets on all CPU cores
+#
+# The puzzles are streamed and cut into chunks like in sudokuParallel.py. Every worker grades a
+# whole chunk at once with sudokuDifficulty.calculate_difficulty_batch: the layout metrics are
+# computed for all its puzzles in one NumPy call, the solution count and the solving techniques
+# still take one solve per puzzle.
+# The difficulty label, the score and every part of the score are written as CSV columns
+# (gzipped if the output name ends with .gz).
+#
+# Usage:
+#   python sudokuGrading.py puzzles.txt.gz [-o grades.csv] [--workers 32] [--chunk-size 512]
+#                           [--unordered] [--time-limit 1.0]
+
+import argparse
+import gzip
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import sudokuDifficulty
+import sudokuSolver
+from sudokuParallel import map_chunks_parallel, read_puzzle_lines
+
+# Grade of one puzzle. label is a difficulty level of sudokuDifficulty.calculate_difficulty,
+# "Invalid" if the line is not a puzzle or "Timeout" if counting the solutions ran out of time.
+# The other fields are None for invalid lines, solution_count is None on timeout
+PuzzleGrade = namedtuple("PuzzleGrade", ["index", "puzzle", "label", "score", "solution_count", "empty_cells",
+                                         "technique_score", "hardest_technique", "symmetry", "isolation",
+                                         "regional_density"])
+
+CSV_HEADER = ",".join(PuzzleGrade._fields)
+
+# Work done by a worker process: grade a whole chunk of (index, puzzle) pairs, never raises
+# time_limit is the budget for counting the solutions of every single puzzle in seconds
+def grade_chunk(chunk, time_limit=None):
+    grades = [None] * len(chunk)
+    boards = []         # (position in chunk, grid) of the lines that are puzzles
+    for position, (index, puzzle) in enumerate(chunk):
+        try:
+            boards.append((position, sudokuSolver.grid_from_string(puzzle)))
+        except ValueError:
+            grades[position] = PuzzleGrade(index, puzzle, "Invalid", *[None] * 8)
+    if not boards:
+        return grades
+
+    levels, scores, parts = sudokuDifficulty.calculate_difficulty_batch(
+        np.array([grid for _, grid in boards]), time_limit=time_limit, details=True)
+    for k, (position, _) in enumerate(boards):
+        index, puzzle = chunk[position]
+        grades[position] = PuzzleGrade(index, puzzle, levels[k], float(scores[k]), parts["solution_count"][k],
+                                       int(parts["empty_cells"][k]), parts["technique_score"][k],
+                                       parts["hardest_technique"][k], int(parts["symmetry"][k]),
+                                       float(parts["isolation"][k]), float(parts["regional_density"][k]))
+    return grades
+
+# Grade an iterable of puzzle strings with a process pool and generate a PuzzleGrade for each,
+# the arguments work like in sudokuParallel.solve_puzzles_parallel
+def grade_puzzles_parallel(puzzles, workers=None, chunk_size=512, ordered=True, time_limit=None):
+    return map_chunks_parallel(grade_chunk, puzzles, (time_limit,), workers, chunk_size, ordered)
+
+# One CSV line of a grade, empty fields for missing values
+def grade_to_csv(grade):
+    fields = []
+    for value in grade:
+        if value is None:
+            fields.append("")
+        elif isinstance(value, float):
+            fields.append(f"{value:.3f}")
+        else:
+            fields.append(str(value))
+    return ",".join(fields)
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade the difficulty of a file of Sudoku puzzles on all CPU cores")
+    parser.add_argument("puzzles", help="File with one 81 character puzzle per line (.gz for gzip)")
+    parser.add_argument("-o", "--output", help="CSV file for the grades, .gz for gzip (default: standard output)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Number of puzzles sent to a worker at once")
+    parser.add_argument("--unordered", action="store_true", help="Write grades as soon as they are ready")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="Time budget per puzzle for counting its solutions in seconds")
+    args = parser.parse_args()
+
+    if args.output:
+        output = gzip.open(args.output, "wt") if args.output.endswith(".gz") else open(args.output, "w")
+    else:
+        output = sys.stdout
+    counts = {}
+    start = time.perf_counter()
+    try:
+        output.write(CSV_HEADER + "\n")
+        grades = grade_puzzles_parallel(read_puzzle_lines(args.puzzles), args.workers, args.chunk_size,
+                                        not args.unordered, args.time_limit)
+        for grade in grades:
+            output.write(grade_to_csv(grade) + "\n")
+            counts[grade.label] = counts.get(grade.label, 0) + 1
+            total = sum(counts.values())
+            if total % 100000 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"Graded {total} puzzles ({total / elapsed:.1f} puzzles/s)", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    # Report to stderr so it doesn't end up in the grades when writing to standard output
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    summary = ", ".join(f"{label}: {count}" for label, count in sorted(counts.items()))
+    print(f"Graded {total} puzzles in {elapsed:.2f} s ({total / elapsed:.1f} puzzles/s) - {summary}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# This .py file solves puzzle datasets on all CPU cores
+#
+# The puzzles (one 81 character line each, 0 or . for empty cells, the file may be gzipped) are read lazily,
+# cut into chunks and solved by a pool of worker processes. Only a few chunks per worker
+# are in flight at any time, so files of any size can be streamed.
+#
+# Usage:
+#   python sudokuParallel.py puzzles.txt [-o solutions.csv] [--workers 32] [--chunk-size 256]
+#                            [--unordered] [--time-limit 1.0] [--engine dlx]
+
+import argparse
+import gzip
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+import sudokuSolver
+
+# Result of one puzzle. status is one of "solved", "no_solution", "invalid" or "timeout"
+PuzzleResult = namedtuple("PuzzleResult", ["index", "puzzle", "solution", "status", "seconds"])
+
+# Generate the puzzle lines of a file (gzipped if the name ends with .gz), skipping blank lines
+def read_puzzle_lines(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as puzzle_file:
+        for line in puzzle_file:
+            line = line.strip()
+            if line:
+                yield line
+
+# Solve one puzzle, never raises
+def solve_one(index, puzzle, engine=None, time_limit=None):
+    start = time.perf_counter()
+    try:
+        matrix = sudokuSolver.grid_from_string(puzzle)
+    except ValueError:
+        return PuzzleResult(index, puzzle, "", "invalid", 0.0)
+
+    try:
+        solved = sudokuSolver.solve_sudoku(matrix, engine, time_limit)
+        status = "solved" if solved else "no_solution"
+    except sudokuSolver.SolveBudgetExceeded:
+        status = "timeout"
+    solution = sudokuSolver.grid_to_string(matrix) if status == "solved" else ""
+    return PuzzleResult(index, puzzle, solution, status, time.perf_counter() - start)
+
+# Work done by a worker process: solve a whole chunk of (index, puzzle) pairs
+def solve_chunk(chunk, engine=None, time_limit=None):
+    return [solve_one(index, puzzle, engine, time_limit) for index, puzzle in chunk]
+
+# Solve an iterable of puzzle strings with a process pool and generate a PuzzleResult for each.
+# ordered=True gives the results in input order, otherwise they come as soon as a chunk is done.
+# time_limit is the budget of every single puzzle in seconds (None for no limit).
+def solve_puzzles_parallel(puzzles, workers=None, chunk_size=256, ordered=True, time_limit=None, engine=None):
+    return map_chunks_parallel(solve_chunk, puzzles, (engine, time_limit), workers, chunk_size, ordered)
+
+# Cut an iterable into chunks of (index, item) pairs, run work(chunk, *args) on a process pool
+# and generate the results of all chunks (work returns a list per chunk).
+# work must be a module level function so that it can be sent to the worker processes
+def map_chunks_parallel(work, items, args=(), workers=None, chunk_size=256, ordered=True):
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    numbered = enumerate(items)
+    chunks = iter(lambda: list(islice(numbered, chunk_size)), [])
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}        # Future -> chunk number
+        finished = {}       # Chunk number -> results, waiting for the earlier chunks (ordered mode)
+        submitted = 0
+        next_to_yield = 0
+
+        def submit_chunks():
+            nonlocal submitted
+            while len(pending) < max_in_flight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                pending[executor.submit(work, chunk, *args)] = submitted
+                submitted += 1
+
+        submit_chunks()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                number = pending.pop(future)
+                if ordered:
+                    finished[number] = future.result()
+                else:
+                    yield from future.result()
+            while next_to_yield in finished:
+                yield from finished.pop(next_to_yield)
+                next_to_yield += 1
+            submit_chunks()
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a file of Sudoku puzzles on all CPU cores")
+    parser.add_argument("puzzles", help="File with one 81 character puzzle per line")
+    parser.add_argument("-o", "--output", help="CSV file for the solutions (default: standard output)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Number of puzzles sent to a worker at once")
+    parser.add_argument("--unordered", action="store_true", help="Write results as soon as they are ready")
+    parser.add_argument("--time-limit", type=float, default=None, help="Time budget per puzzle in seconds")
+    parser.add_argument("--engine", choices=list(sudokuSolver.ENGINES), default=None, help="Solver engine")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    counts = {}
+    start = time.perf_counter()
+    try:
+        output.write("index,puzzle,solution,status,milliseconds\n")
+        results = solve_puzzles_parallel(read_puzzle_lines(args.puzzles), args.workers, args.chunk_size,
+                                         not args.unordered, args.time_limit, args.engine)
+        for result in results:
+            output.write(f"{result.index},{result.puzzle},{result.solution},{result.status},{result.seconds * 1000:.3f}\n")
+            counts[result.status] = counts.get(result.status, 0) + 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    # Report to stderr so it doesn't end up in the solutions when writing to standard output
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    summary = ", ".join(f"{status}: {count}" for status, count in sorted(counts.items()))
+    print(f"Solved {total} puzzles in {elapsed:.2f} s ({total / elapsed:.1f} puzzles/s) - {summary}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,14 @@
-# This .py file contains a function to solve Sudoku using Best-First search
+# This .py file contains the Sudoku solver engines
+#
+# "bitmask" (default): Backtracking with constraint propagation.
+# The digits used by every row, column and 3x3 block are kept as 9-bit masks which are
+# updated incrementally when a digit is placed or removed, so the candidates of a cell are
+# a couple of bit operations away. The next cell is the one with the minimum remaining values
+# and cells which only have one candidate left (naked singles) are filled in right away.
+#
+# "dlx": Exact cover search with Dancing Links, see dancingLinks.py
+#
+# "best_first": The original solver, using Best-First search
 # Best first search algorithms is an optimized version of Backtracking,
 # where the "next cell" is the cell which has the least number of possibilities
 # The 'number of possibilities' is calculated for each cell, by going through its corresponding
@@ -6,6 +16,10 @@
 # This greedy heuristic increase the efficiency of the program substantially, as it minimizes the branching factor.
 
 import heapq  # Import heapq for min-heap operations
+from collections import namedtuple
+import dancingLinks
+from candidateGrid import ALL_DIGITS, BIT_COUNT
+from solveBudget import SolveBudgetExceeded, make_budget
 
 # Keep data about the "Best" cell
 class EntryData:
@@ -26,29 +40,258 @@ class EntryData:
     def __eq__(self, other):
         return self.choices == other.choices
 
+# Solve Sudoku in place with the chosen engine (DEFAULT_ENGINE if None)
+# Return True if the matrix has been filled with a solution, False if there is no solution
+# The search can be limited by time_limit (seconds), max_nodes (search nodes) and cancelled
+# by setting cancel_token (e.g. a threading.Event) from another thread. When that happens,
+# SolveBudgetExceeded is raised and the matrix is left as it was
+# candidates is the candidateGrid.CandidateGrid of the matrix if it has already been computed
+def solve_sudoku(matrix, engine=None, time_limit=None, max_nodes=None, cancel_token=None, candidates=None):
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown solver engine '{engine}', choose from {sorted(ENGINES)}")
+    return ENGINES[engine](matrix, make_budget(time_limit, max_nodes, cancel_token), candidates)
+
+# Count the solutions of a Sudoku, stopping as soon as "limit" solutions are found
+# (None to count them all). With the default limit of 2 this tells apart puzzles without
+# a solution (0), proper puzzles (1) and puzzles with several solutions (2), which for a
+# recognized grid is a strong sign of a misread digit.
+# If fill is True, the matrix is filled in place with the first solution found.
+# The budget and candidates arguments work like in solve_sudoku.
+def count_solutions(matrix, limit=2, engine=None, time_limit=None, fill=False, max_nodes=None, cancel_token=None,
+                    candidates=None):
+    engine = engine or DEFAULT_ENGINE
+    if engine not in COUNTING_ENGINES:
+        raise ValueError(f"Solver engine '{engine}' can't count solutions, choose from {sorted(COUNTING_ENGINES)}")
+    budget = make_budget(time_limit, max_nodes, cancel_token)
+    count, first_solution = COUNTING_ENGINES[engine](matrix, limit or float("inf"), budget, candidates)
+    if fill and first_solution is not None:
+        for i in range(9):
+            matrix[i][:] = first_solution[i]
+    return count
+
+# Solve Sudoku using backtracking on row/column/block bitmasks
+def solve_sudoku_bitmask(matrix, budget=None, candidates=None):
+    solver = BitmaskSolver(matrix, budget, candidates)
+    if not solver.valid or not solver.search():
+        return False
+    solver.write_solution(matrix)
+    return True
+
+# Result of solving one grid
+# status: "solved", "multiple" (more than one solution), "no_solution" or "timeout"
+# solution_count: 0, 1 or 2 (2 = at least two), None on timeout
+# solution: the solved 9x9 grid when status is "solved", otherwise None
+# reason: why the budget ran out on timeout ("time", "nodes" or "cancelled"), otherwise None
+SolveResult = namedtuple("SolveResult", ["status", "solution_count", "solution", "reason"])
+
+# Count the solutions of a grid (stopping at 2) within a budget, never raises on timeout
+def solve_grid(grid, time_limit=None, max_nodes=None, cancel_token=None, candidates=None):
+    solved_grid = [row[:] for row in grid]
+    try:
+        solution_count = count_solutions(solved_grid, 2, fill=True, time_limit=time_limit,
+                                        max_nodes=max_nodes, cancel_token=cancel_token, candidates=candidates)
+    except SolveBudgetExceeded as e:
+        return SolveResult("timeout", None, None, e.reason)
+
+    if solution_count == 1:
+        return SolveResult("solved", 1, solved_grid, None)
+    if solution_count > 1:
+        return SolveResult("multiple", solution_count, None, None)
+    return SolveResult("no_solution", 0, None, None)
+
+# Count solutions using backtracking on row/column/block bitmasks
+# Return the number of solutions (at most limit) and the first solution (None if there is none)
+def count_solutions_bitmask(matrix, limit, budget=None, candidates=None):
+    solver = BitmaskSolver(matrix, budget, candidates)
+    if not solver.valid:
+        return 0, None
+    solver.search(limit)
+    if solver.first_solution is None:
+        return solver.found, None
+    return solver.found, [solver.first_solution[i*9:(i+1)*9] for i in range(9)]
+
+# Count solutions using Dancing Links, same return value as count_solutions_bitmask
+# The links are built from the digits, the candidates only reject conflicting grids early
+def count_solutions_dlx(matrix, limit, budget=None, candidates=None):
+    if candidates is not None and not candidates.valid:
+        return 0, None
+    count = 0
+    first_solution = None
+    for solved in dancingLinks.iter_solutions(matrix, budget):
+        count += 1
+        if first_solution is None:
+            first_solution = solved
+        if count >= limit:
+            break
+    return count, first_solution
+
+# Keep the state of the board as bitmasks of used digits
+class BitmaskSolver:
+    # candidates is the CandidateGrid of the matrix, its masks are copied instead of scanning the matrix
+    def __init__(self, matrix, budget=None, candidates=None):
+        self.budget = budget    # SolveBudget ticked on every search node, None for no limit
+        self.values = [0] * 81
+        self.rows = [0] * 9
+        self.cols = [0] * 9
+        self.boxes = [0] * 9
+        self.empty = []     # Indices (row * 9 + col) of the unfilled cells
+        self.valid = True   # False if the given digits already conflict
+        self.found = 0      # Number of solutions found by search()
+        self.first_solution = None
+
+        if candidates is not None:
+            self.values = candidates.values[:]
+            self.rows = candidates.rows[:]
+            self.cols = candidates.cols[:]
+            self.boxes = candidates.boxes[:]
+            self.empty = [cell for cell in range(81) if self.values[cell] == 0]
+            self.valid = candidates.valid
+            return
+
+        for i in range(9):
+            for j in range(9):
+                cell = i * 9 + j
+                digit = matrix[i][j]
+                if digit == 0:
+                    self.empty.append(cell)
+                    continue
+                bit = 1 << (digit - 1)
+                b = (i // 3) * 3 + j // 3
+                if (self.rows[i] | self.cols[j] | self.boxes[b]) & bit:
+                    self.valid = False
+                self.place(cell, digit)
+
+    # Candidates of a cell, as a 9-bit mask
+    def candidates(self, cell):
+        i = cell // 9
+        j = cell % 9
+        return ALL_DIGITS & ~(self.rows[i] | self.cols[j] | self.boxes[(i // 3) * 3 + j // 3])
+
+    def place(self, cell, digit):
+        i = cell // 9
+        j = cell % 9
+        bit = 1 << (digit - 1)
+        self.values[cell] = digit
+        self.rows[i] |= bit
+        self.cols[j] |= bit
+        self.boxes[(i // 3) * 3 + j // 3] |= bit
+
+    def remove(self, cell):
+        i = cell // 9
+        j = cell % 9
+        bit = 1 << (self.values[cell] - 1)
+        self.values[cell] = 0
+        self.rows[i] &= ~bit
+        self.cols[j] &= ~bit
+        self.boxes[(i // 3) * 3 + j // 3] &= ~bit
+
+    # Find the unfilled cell with the minimum remaining values
+    # Return (index in self.empty, candidates mask), the mask is 0 on a dead end
+    def pick_cell(self):
+        best_index = -1
+        best_mask = 0
+        best_count = 10
+        for k, cell in enumerate(self.empty):
+            mask = self.candidates(cell)
+            count = BIT_COUNT[mask]
+            if count < best_count:
+                best_index, best_mask, best_count = k, mask, count
+                if count <= 1:  # Can't do better than a dead end or a naked single
+                    break
+        return best_index, best_mask
+
+    # Take a cell out of the unfilled list (order of the list doesn't matter)
+    def take_empty(self, k):
+        cell = self.empty[k]
+        self.empty[k] = self.empty[-1]
+        self.empty.pop()
+        return cell
+
+    # Depth-first search, return True as soon as "limit" solutions have been found
+    # (the board then holds the last one). Otherwise every placement made by this call is undone
+    def search(self, limit=1):
+        if self.budget is not None:
+            self.budget.tick()
+        forced = []     # Naked singles placed at this level
+        while True:
+            if not self.empty:
+                self.found += 1
+                if self.first_solution is None:
+                    self.first_solution = self.values[:]
+                if self.found >= limit:
+                    return True
+                mask = 0    # Keep looking for more solutions
+                break
+            k, mask = self.pick_cell()
+            if mask == 0 or BIT_COUNT[mask] > 1:
+                break
+            # Naked single: only one digit fits, place it without branching
+            cell = self.take_empty(k)
+            self.place(cell, mask.bit_length())
+            forced.append(cell)
+
+        if mask != 0:
+            cell = self.take_empty(k)
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                self.place(cell, bit.bit_length())
+                if self.search(limit):
+                    return True
+                self.remove(cell)
+            self.empty.append(cell)
+
+        # Dead end (or counting past a solution), undo the naked singles
+        for cell in reversed(forced):
+            self.remove(cell)
+            self.empty.append(cell)
+        return False
+
+    def write_solution(self, matrix):
+        for i in range(9):
+            for j in range(9):
+                matrix[i][j] = self.values[i * 9 + j]
+
 # Solve Sudoku using Best-first search
-def solve_sudoku(matrix):
+def solve_sudoku_best_first(matrix, budget=None, candidates=None):
     cont = [True]
     # See if it is even possible to have a solution
-    for i in range(9):
-        for j in range(9):
-            if not can_be_correct(matrix, i, j): # If it is not possible, stop
-                return
+    if candidates is not None:
+        if not candidates.valid:
+            return False
+    else:
+        for i in range(9):
+            for j in range(9):
+                if not can_be_correct(matrix, i, j): # If it is not possible, stop
+                    return False
     
     # Initialize the heap with all empty cells
     cell_heap = []
     for i in range(9):
         for j in range(9):
             if matrix[i][j] == 0:  # If it is unfilled
-                num_choices = count_choices(matrix, i, j)
+                if candidates is not None:
+                    num_choices = BIT_COUNT[candidates.mask(i, j)]
+                else:
+                    num_choices = count_choices(matrix, i, j)
                 heapq.heappush(cell_heap, EntryData(i, j, num_choices))
     
-    sudoku_helper(matrix, cont, cell_heap)  # Pass the heap to the helper function
+    original = [row[:] for row in matrix]
+    try:
+        sudoku_helper(matrix, cont, cell_heap, budget)  # Pass the heap to the helper function
+    except SolveBudgetExceeded:
+        for i in range(9):
+            matrix[i][:] = original[i]  # The search was interrupted half way, restore the board
+        raise
+    return not cont[0]  # The flag is cleared once the board is filled
 
 # Helper function - The heart of Best First Search
-def sudoku_helper(matrix, cont, cell_heap):
+def sudoku_helper(matrix, cont, cell_heap, budget=None):
     if not cont[0]:  # Stopping point 1
         return
+    if budget is not None:
+        budget.tick()
     
     # If heap is empty, we've filled the board
     if not cell_heap:
@@ -78,7 +321,7 @@ def sudoku_helper(matrix, cont, cell_heap):
                         num_choices = count_choices(matrix, i, k)
                         heapq.heappush(new_heap, EntryData(i, k, num_choices))
             
-            sudoku_helper(matrix, cont, new_heap)
+            sudoku_helper(matrix, cont, new_heap, budget)
     
     if not cont[0]:  # Stopping point 3
         return
@@ -136,6 +379,17 @@ def can_be_correct(matrix, row, col):
     
     return True
 
+# Convert an 81 character puzzle string (row by row, 0 or . for empty cells) to a 9x9 matrix
+def grid_from_string(puzzle):
+    puzzle = puzzle.strip()
+    if len(puzzle) != 81:
+        raise ValueError(f"Puzzle must have 81 cells, got {len(puzzle)}")
+    return [[0 if ch in "0." else int(ch) for ch in puzzle[i*9:(i+1)*9]] for i in range(9)]
+
+# Convert a 9x9 matrix to an 81 character string, 0 for empty cells
+def grid_to_string(matrix):
+    return "".join(str(matrix[i][j]) for i in range(9) for j in range(9))
+
 # Return true if the whole board has been occupied by some non-zero number
 # If this happens, the current board is the solution to the original Sudoku
 def all_board_non_zero(matrix):
@@ -143,4 +397,18 @@ def all_board_non_zero(matrix):
         for j in range(9):
             if matrix[i][j] == 0:
                 return False
-    return True
\ No newline at end of file
+    return True
+
+# Available solver engines, selected by name in solve_sudoku
+ENGINES = {
+    "bitmask": solve_sudoku_bitmask,
+    "dlx": dancingLinks.solve_sudoku_dlx,
+    "best_first": solve_sudoku_best_first,
+}
+DEFAULT_ENGINE = "bitmask"
+
+# Engines that can count solutions, used by count_solutions
+COUNTING_ENGINES = {
+    "bitmask": count_solutions_bitmask,
+    "dlx": count_solutions_dlx,
+}
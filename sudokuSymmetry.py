@@ -0,0 +1,80 @@
+# This .py file maps Sudoku grids to a canonical representative of their symmetry class
+#
+# These changes turn a valid Sudoku into another valid Sudoku, with the solution changed the same way:
+# - transposition
+# - permuting the 3 bands (groups of 3 rows) and the 3 stacks (groups of 3 columns)
+# - permuting the rows inside the bands and the columns inside the stacks
+#   (the same way in every band / stack, which together with the above covers rotations and mirrors)
+# - relabelling the digits
+# canonicalize() tries all 2 * 6^4 = 2592 geometric transforms at once with NumPy, relabels
+# the digits of each in order of first appearance and keeps the smallest grid. Equivalent
+# puzzles get the same canonical grid, so one solve can answer all of them.
+
+from collections import namedtuple
+from itertools import permutations, product
+
+import numpy as np
+
+# A transform maps grid to out[i][j] = digits[source[rows[i]][cols[j]]],
+# where source is the grid, transposed first if transpose is set
+Transform = namedtuple("Transform", ["transpose", "rows", "cols", "digits"])
+
+# All orders of 9 lines that keep bands (or stacks) together, moving the lines inside
+# every band the same way
+def line_orders():
+    orders = []
+    for outer, inner in product(permutations(range(3)), permutations(range(3))):
+        orders.append(tuple(3 * b + k for b in outer for k in inner))
+    return orders
+
+LINE_ORDERS = line_orders()
+
+# Geometric part (transpose, rows, cols) of every transform, and for each of them
+# the original cell index every output cell is read from, (2592, 81)
+GEOMETRIES = [(transpose, rows, cols) for transpose in (False, True)
+              for rows in LINE_ORDERS for cols in LINE_ORDERS]
+SOURCE_CELLS = np.array([[cols[j] * 9 + rows[i] if transpose else rows[i] * 9 + cols[j]
+                          for i in range(9) for j in range(9)]
+                         for transpose, rows, cols in GEOMETRIES], dtype=np.intp)
+CANDIDATES = np.arange(len(GEOMETRIES))
+
+# Return (canonical_grid, transform) with canonical_grid = apply_transform(grid, transform)
+# Equivalent grids have the same canonical grid
+def canonicalize(grid):
+    flat = np.asarray(grid, dtype=np.uint8).reshape(81)
+    values = flat[SOURCE_CELLS].astype(np.intp)                             # (2592, 81)
+
+    # Relabel the digits of every candidate in order of first appearance (row by row).
+    # Missing digits go last in increasing order, so the relabelling is always a full permutation
+    count = len(values)
+    first = np.full((count, 10), 81, dtype=np.intp)                       # first[t, digit] = first cell index
+    for cell in range(80, -1, -1):
+        first[CANDIDATES, values[:, cell]] = cell
+    order = np.argsort(first[:, 1:], axis=1, kind="stable")                 # Digits - 1 by first appearance
+    labels = np.zeros((count, 10), dtype=np.uint8)                         # labels[t, digit] = new digit
+    labels[CANDIDATES[:, None], order + 1] = np.arange(1, 10, dtype=np.uint8)
+    relabelled = labels.ravel()[values + CANDIDATES[:, None] * 10]
+
+    # Keep the lexicographically smallest candidate, comparing the rows as byte strings
+    # (+1 so that no byte is 0, NumPy drops trailing zero bytes)
+    best = int(np.ascontiguousarray(relabelled + 1).view("S81").ravel().argmin())
+    transpose, rows, cols = GEOMETRIES[best]
+    transform = Transform(transpose, rows, cols, tuple(int(d) for d in labels[best]))
+    canonical = relabelled[best].reshape(9, 9).tolist()
+    return canonical, transform
+
+# Apply a transform to a 9x9 grid, return a new grid
+def apply_transform(grid, transform):
+    source = [list(row) for row in zip(*grid)] if transform.transpose else grid
+    return [[transform.digits[source[transform.rows[i]][transform.cols[j]]] for j in range(9)] for i in range(9)]
+
+# Undo apply_transform: map a grid (e.g. the solution of a canonical grid) back, return a new grid
+def undo_transform(grid, transform):
+    inverse_digits = [0] * 10
+    for digit, label in enumerate(transform.digits):
+        inverse_digits[label] = digit
+    source = [[0] * 9 for _ in range(9)]
+    for i in range(9):
+        for j in range(9):
+            source[transform.rows[i]][transform.cols[j]] = inverse_digits[grid[i][j]]
+    return [list(row) for row in zip(*source)] if transform.transpose else source